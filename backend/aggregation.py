@@ -0,0 +1,134 @@
+"""Robust price aggregation: median/MAD outlier rejection and weighted means.
+
+A price is an outlier when it is more than ``threshold`` robust standard
+deviations (1.4826 * MAD) from the median. The spread never counts as
+less than ``min_spread`` of the median, so a handful of identical prices
+doesn't make every other price an outlier.
+
+Whole windows are processed as arrays: with numpy installed every group
+is handled by a few sorts and index operations, without it the same
+results come from plain Python lists.
+"""
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAD_SCALE = 1.4826
+OUTLIER_THRESHOLD = 3.5
+MIN_SPREAD = 0.05
+
+
+def _median(ordered):
+    count = len(ordered)
+    return (ordered[(count - 1) // 2] + ordered[count // 2]) / 2
+
+
+def _spread(median, mad, min_spread):
+    return max(mad * MAD_SCALE, abs(median) * min_spread)
+
+
+def robust_stats(values, weights=None, threshold=OUTLIER_THRESHOLD, min_spread=MIN_SPREAD):
+    """Median, MAD and weighted mean of values, with the outliers left out of the mean.
+
+    Returns a dict with the figures and ``inliers``, one bool per value;
+    None if there are no values.
+    """
+    values = [float(value) for value in values]
+    if not values:
+        return None
+    weights = [1.0] * len(values) if weights is None else [float(weight) for weight in weights]
+    median = _median(sorted(values))
+    mad = _median(sorted(abs(value - median) for value in values))
+    limit = threshold * _spread(median, mad, min_spread)
+    inliers = [abs(value - median) <= limit for value in values]
+    kept = [value for value, inlier in zip(values, inliers) if inlier]
+    kept_weights = [weight for weight, inlier in zip(weights, inliers) if inlier]
+    total_weight = sum(kept_weights)
+    if total_weight > 0:
+        mean = sum(value * weight for value, weight in zip(kept, kept_weights)) / total_weight
+    else:
+        mean = sum(kept) / len(kept)
+    return {
+        "median": median,
+        "mad": mad,
+        "mean": mean,
+        "min": min(kept),
+        "max": max(kept),
+        "count": len(kept),
+        "rejected": len(values) - len(kept),
+        "inliers": inliers
+    }
+
+
+def outlier_flags(values, median, mad, threshold=OUTLIER_THRESHOLD, min_spread=MIN_SPREAD):
+    """One bool per value: is it an outlier against a known median and MAD"""
+    limit = threshold * _spread(median, mad, min_spread)
+    if numpy is not None:
+        return (numpy.abs(numpy.asarray(values, dtype=float) - median) > limit).tolist()
+    return [abs(float(value) - median) > limit for value in values]
+
+
+def group_outliers(groups, values, threshold=OUTLIER_THRESHOLD, min_spread=MIN_SPREAD):
+    """Median/MAD per group and an outlier flag per value.
+
+    ``groups`` holds a small integer key per value (e.g. a district index).
+    Returns ({group: {"median", "mad", "count"}}, flags).
+    """
+    if numpy is not None:
+        return _group_outliers_numpy(groups, values, threshold, min_spread)
+
+    members = {}
+    for position, (group, value) in enumerate(zip(groups, values)):
+        members.setdefault(group, []).append(position)
+    stats = {}
+    flags = [False] * len(values)
+    for group, positions in members.items():
+        prices = [float(values[position]) for position in positions]
+        median = _median(sorted(prices))
+        mad = _median(sorted(abs(price - median) for price in prices))
+        limit = threshold * _spread(median, mad, min_spread)
+        for position, price in zip(positions, prices):
+            flags[position] = abs(price - median) > limit
+        stats[group] = {"median": median, "mad": mad, "count": len(prices)}
+    return stats, flags
+
+
+def _group_outliers_numpy(groups, values, threshold, min_spread):
+    groups = numpy.asarray(groups, dtype=numpy.int64)
+    values = numpy.asarray(values, dtype=float)
+    if not len(values):
+        return {}, []
+    # Sort by group, then by price: each group is a sorted run
+    order = numpy.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    counts = numpy.diff(numpy.r_[starts, len(values)])
+    low, high = starts + (counts - 1) // 2, starts + counts // 2
+
+    medians = (sorted_values[low] + sorted_values[high]) / 2
+    deviations = numpy.abs(sorted_values - numpy.repeat(medians, counts))
+    sorted_deviations = deviations[numpy.lexsort((deviations, sorted_groups))]
+    mads = (sorted_deviations[low] + sorted_deviations[high]) / 2
+
+    spreads = numpy.maximum(mads * MAD_SCALE, numpy.abs(medians) * min_spread)
+    flags = numpy.empty(len(values), dtype=bool)
+    flags[order] = deviations > threshold * numpy.repeat(spreads, counts)
+
+    stats = {
+        int(group): {"median": float(median), "mad": float(mad), "count": int(count)}
+        for group, median, mad, count in zip(sorted_groups[starts], medians, mads, counts)
+    }
+    return stats, flags.tolist()
+
+
+def is_outlier(value, reference, threshold=OUTLIER_THRESHOLD, min_spread=MIN_SPREAD):
+    """Whether one price is an outlier against robust_stats output (False without a reference)"""
+    if not reference or value is None:
+        return False
+    if not math.isfinite(value):
+        return True
+    return abs(value - reference["median"]) > threshold * _spread(reference["median"], reference["mad"], min_spread)
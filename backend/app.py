@@ -1,37 +1,171 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from datetime import datetime, timedelta
+import atexit
+import base64
+import csv
+import io
 import json
 import os
 import random
-from scraper import CoconutPriceScraper
+import threading
+import time
+from aggregation import group_outliers, is_outlier, outlier_flags, robust_stats
+from districts import TAMIL_NADU_DISTRICTS, DistrictView, normalize_district
+from events import Broadcaster
+from group_commit import GroupCommitQueue
+from http_cache import ConditionalGet, DataVersion, FastJSONProvider, ResponseCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, RequestMetrics
+from rollups import RESOLUTIONS
+from scheduler import RefreshScheduler
+from storage import FileLock, PriceStore, SubmissionLog, parse_timestamp
 
 app = Flask(__name__)
+# orjson when installed, the standard encoder otherwise
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # File paths
 PRICES_FILE = 'data/prices.json'
 SUBMISSIONS_FILE = 'data/submissions.json'
+SUBMISSIONS_JOURNAL = 'data/submissions.jsonl'
+PRICES_COLUMNAR_FILE = 'data/prices.cph'
+# Held while a refresh runs, and by the worker that runs the schedule
+REFRESH_LOCK_FILE = 'data/refresh.lock'
+SCHEDULER_LOCK_FILE = 'data/refresh-scheduler.lock'
 
-# Initialize scraper
-scraper = CoconutPriceScraper()
+# Storage backend: 'json' (files above), 'columnar' (price history in
+# PRICES_COLUMNAR_FILE, imported from PRICES_FILE on first start) or 'sqlite'
+STORAGE_BACKEND = os.environ.get('COCONUT_STORAGE', 'json')
+SQLITE_FILE = os.environ.get('COCONUT_SQLITE_FILE', 'data/coconut.db')
 
-def load_json_file(filepath, default_data):
-    """Load JSON file, create if doesn't exist"""
-    if os.path.exists(filepath):
-        with open(filepath, 'r') as f:
-            return json.load(f)
+# Seconds between background price refreshes (0 = only on POST /api/price/refresh)
+REFRESH_INTERVAL = int(os.environ.get('COCONUT_REFRESH_INTERVAL', 0))
+
+# Columns of the CSV exports
+PRICE_EXPORT_COLUMNS = ['id', 'timestamp', 'average_price', 'min_price', 'max_price', 'source_count']
+SUBMISSION_EXPORT_COLUMNS = ['id', 'type', 'timestamp', 'district', 'market', 'user_price',
+                             'system_price', 'status', 'contact', 'notes']
+
+# Approved submissions older than this drop out of /api/districts;
+# trend compares the last DISTRICT_TREND_DAYS with the rest of the window
+DISTRICT_WINDOW_DAYS = 30
+DISTRICT_TREND_DAYS = 7
+
+# Weight of each scraped source in the average price (unlisted sources count 1.0)
+SOURCE_WEIGHTS = {
+    "commodityonline": 1.0,
+    "commoditymarketlive": 1.0,
+    "kisantak": 1.0,
+    "krishidunia": 1.0
+}
+
+# Review outcomes an admin can set on a submission
+SUBMISSION_STATUSES = ('pending', 'approved', 'rejected')
+
+# Largest accepted POST /api/submit/batch
+MAX_BATCH_SIZE = 5000
+
+# Rows per page of /api/submissions (and of /api/history when ?limit= or ?cursor= is given)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Fold the submissions journal into submissions.json every few minutes
+COMPACT_INTERVAL = 300
+
+# Seconds by which the moving time windows of /api/history?days=,
+# /api/districts and /api/submissions/outliers may lag the clock in
+# revalidated and cached responses
+CLOCK_GRANULARITY = 60
+
+# How single submissions are written: 'fsync' (group-committed, reply once on
+# disk), 'enqueue' (group-committed, reply once queued) or 'direct' (one write
+# per request)
+WRITE_MODE = os.environ.get('COCONUT_WRITE_MODE', 'fsync')
+
+# Most /api/events streams one process keeps open (0 = no limit). Under a
+# threaded server each holds a request thread; gunicorn.conf.py sets this
+# to half the threads of a gthread worker
+MAX_EVENT_STREAMS = int(os.environ.get('COCONUT_MAX_EVENT_STREAMS', 0))
+
+# 0 = encode every read afresh instead of reusing bodies encoded for the
+# current ETag (conditional requests still get 304s)
+RESPONSE_CACHE = os.environ.get('COCONUT_RESPONSE_CACHE', '1') != '0'
+
+# Set by wsgi.py, which imports the app in the master process before
+# forking workers: background threads are then started in each worker
+# (start_background_tasks) since threads don't survive a fork
+PRELOAD = os.environ.get('COCONUT_PRELOAD') == '1'
+
+# Created on first refresh, so processes that only serve reads never
+# import requests and bs4
+_scraper = None
+_scraper_lock = threading.Lock()
+
+def get_scraper():
+    global _scraper
+    with _scraper_lock:
+        if _scraper is None:
+            from scraper import CoconutPriceScraper
+            _scraper = CoconutPriceScraper()
+        return _scraper
+
+if STORAGE_BACKEND == 'sqlite':
+    from sqlite_store import SqliteDatabase, SqlitePriceStore, SqliteSubmissionStore
+    database = SqliteDatabase(SQLITE_FILE)
+    prices_store = SqlitePriceStore(database)
+    submissions_store = SqliteSubmissionStore(database)
+else:
+    # Shared in-memory copies of the data files
+    if STORAGE_BACKEND == 'columnar':
+        from columnar import ColumnarPriceStore
+        prices_store = ColumnarPriceStore(PRICES_COLUMNAR_FILE, import_from=PRICES_FILE)
     else:
-        # Create directory if needed
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w') as f:
-            json.dump(default_data, f, indent=2)
-        return default_data
+        prices_store = PriceStore(PRICES_FILE)
+    submissions_store = SubmissionLog(SUBMISSIONS_FILE, SUBMISSIONS_JOURNAL)
+
+# Per-district figures from approved submissions, updated on every submission change
+district_view = DistrictView(window_days=DISTRICT_WINDOW_DAYS, trend_days=DISTRICT_TREND_DAYS)
+submissions_store.subscribe(district_view)
+
+# Per-endpoint request counts and latencies for /metrics; registered
+# first so requests answered early with a 304 are counted too
+RequestMetrics(app)
+
+def clock_state():
+    """Current CLOCK_GRANULARITY slot, for responses with a window ending now"""
+    return int(time.time() // CLOCK_GRANULARITY)
+
+def history_state():
+    # Only the ?days= window moves with the clock; ?from=/?to= ranges don't
+    if 'from' in request.args or 'to' in request.args:
+        return None
+    return clock_state()
+
+# ETags follow the stored data (and the clock or a running refresh for
+# the views that depend on them); unchanged polls get 304 Not Modified
+# and repeated reads get the bytes encoded for the current ETag
+data_version = DataVersion(prices_store, submissions_store)
+ConditionalGet(app, data_version, endpoints=[
+    'home', 'get_price', 'get_history', 'get_district_prices', 'get_submissions',
+    'get_submission_outliers', 'get_stats'
+], cache=ResponseCache() if RESPONSE_CACHE else None, state={
+    'get_price': lambda: refresher.in_flight(),
+    'get_history': history_state,
+    'get_district_prices': clock_state,
+    'get_submission_outliers': clock_state
+})
+
+# Pushes price and stats changes to /api/events subscribers
+broadcaster = Broadcaster(max_subscribers=MAX_EVENT_STREAMS)
 
-def save_json_file(filepath, data):
-    """Save data to JSON file"""
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+# Submissions arriving together are stored in one write
+submission_writer = None
+if WRITE_MODE != 'direct':
+    submission_writer = GroupCommitQueue(submissions_store, durability=WRITE_MODE,
+                                         on_commit=lambda: data_changed())
+    # Don't lose queued submissions on a clean shutdown
+    atexit.register(submission_writer.close)
 
 @app.route('/')
 def home():
@@ -40,28 +174,33 @@ def home():
         "version": "1.0.0",
         "endpoints": {
             "/api/price": "GET - Get current coconut price",
-            "/api/price/refresh": "POST - Manually refresh price",
-            "/api/history": "GET - Get price history (add ?days=7)",
+            "/api/price/refresh": "POST - Manually refresh price (add ?wait=false to not wait)",
+            "/api/history": "GET - Get price history (add ?days=7 or ?from=...&to=..., ?resolution=hour|day|week, ?include_sources=false, ?limit=&cursor= to page)",
             "/api/verify": "POST - Verify if price is correct",
             "/api/submit": "POST - Submit new price",
+            "/api/submit/batch": "POST - Submit many prices (JSON array or NDJSON)",
             "/api/districts": "GET - Get district-wise prices",
-            "/api/submissions": "GET - Get user submissions"
+            "/api/submissions": "GET - Get user submissions a page at a time (?limit=, ?cursor=, ?status=, ?district=, ?order=asc|desc)",
+            "/api/submissions/outliers": "GET - Submissions far from their district's median (?hours=24)",
+            "/api/submissions/<id>/status": "POST - Approve or reject a submission",
+            "/api/export/history": "GET - Stream price history (?format=ndjson|csv, ?from=, ?to=)",
+            "/api/export/submissions": "GET - Stream submissions (?format=ndjson|csv, ?status=, ?from=, ?to=)",
+            "/api/events": "GET - Server-Sent Events with price and stats changes",
+            "/metrics": "GET - Prometheus metrics"
         }
     })
 
 @app.route('/api/price', methods=['GET'])
 def get_price():
     """Get current coconut price"""
-    prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
+    latest_price = prices_store.latest()
     
-    if not prices_data["prices"]:
+    if not latest_price:
         return jsonify({
             "success": False,
             "message": "No price data available. Please refresh prices."
         }), 404
     
-    latest_price = prices_data["prices"][-1]
-    
     return jsonify({
         "success": True,
         "data": {
@@ -69,85 +208,178 @@ def get_price():
             "min_price": latest_price["min_price"],
             "max_price": latest_price["max_price"],
             "source_count": latest_price["source_count"],
-            "last_updated": latest_price["timestamp"]
+            "last_updated": latest_price["timestamp"],
+            "refreshing": refresher.in_flight()
         },
         "message": "Price retrieved successfully"
     })
 
+def current_stats():
+    """Figures served by /api/stats, or None without price data"""
+    latest_price = prices_store.latest()
+    if not latest_price:
+        return None
+    price_stats = prices_store.stats()
+    if not price_stats:
+        return None
+    
+    # Rolling figures are maintained by the write paths, nothing to scan here
+    change = price_stats["latest_change"]
+    status_counts = submissions_store.status_counts()
+    
+    return {
+        "current_price": latest_price["average_price"],
+        "min_today": latest_price["min_price"],
+        "max_today": latest_price["max_price"],
+        "source_count": latest_price["source_count"],
+        "seven_day_average": price_stats["seven_day_average"],
+        "seven_day_min": price_stats["seven_day_min"],
+        "seven_day_max": price_stats["seven_day_max"],
+        "weekly_change": f"{'+' if change >= 0 else ''}{change}%",
+        "total_submissions": submissions_store.count(),
+        "pending_submissions": status_counts.get('pending', 0),
+        "submissions_by_status": status_counts,
+        "data_points": price_stats["data_points"],
+        "last_updated": latest_price["timestamp"]
+    }
+
+def data_changed():
+    """After a write: notify /api/events subscribers (cached responses follow the stores' versions)"""
+    publish_updates()
+
+def publish_updates(force=False):
+    """Send what changed in the price and the stats to /api/events subscribers"""
+    if not force and not broadcaster.subscribers:
+        return
+    latest_price = prices_store.latest()
+    if latest_price:
+        broadcaster.publish('price', {
+            "current_price": latest_price["average_price"],
+            "min_price": latest_price["min_price"],
+            "max_price": latest_price["max_price"],
+            "source_count": latest_price["source_count"],
+            "last_updated": latest_price["timestamp"]
+        })
+    stats = current_stats()
+    if stats:
+        broadcaster.publish('stats', stats)
+
+def refresh_prices():
+    """Scrape sources and store a new price entry; None if no valid prices.
+
+    One process refreshes at a time. A refresh that had to wait for
+    another process's returns the price that one stored instead of
+    scraping again.
+    """
+    requested = time.time()
+    with refresh_lock:
+        last = last_refresh()
+        if last is not None and last >= requested:
+            print("⏭️  Prices were refreshed by another worker meanwhile")
+            return prices_store.latest()
+        return scrape_prices()
+
+def last_refresh():
+    """Epoch time of the newest stored price, whichever process stored it"""
+    latest = prices_store.latest()
+    return parse_timestamp(latest["timestamp"]) if latest else None
+
+def scrape_prices():
+    print("🔄 Refreshing coconut prices...")
+    
+    # For demo purposes, we'll simulate scraping
+    # In production, uncomment the real scraping:
+    # scraped_prices = get_scraper().scrape_all_sources_concurrent(timeout=5, deadline=15)
+    
+    # Simulated scraping for demo
+    scraped_prices = [
+        {"source": "commodityonline", "price": random.randint(26, 32), "timestamp": datetime.now().isoformat()},
+        {"source": "commoditymarketlive", "price": random.randint(27, 31), "timestamp": datetime.now().isoformat()},
+        {"source": "kisantak", "price": random.randint(25, 30), "timestamp": datetime.now().isoformat()},
+        {"source": "krishidunia", "price": random.randint(28, 33), "timestamp": datetime.now().isoformat()},
+        {"source": "krishidunia", "price": random.randint(27, 32), "timestamp": datetime.now().isoformat()}
+    ]
+    
+    print(f"📊 Scraped {len(scraped_prices)} prices")
+    
+    # Extract valid prices
+    valid = [p for p in scraped_prices if 10 <= p["price"] <= 100]
+    
+    if not valid:
+        return None
+    
+    # Weighted mean of the prices left after median/MAD outlier rejection
+    stats = robust_stats([p["price"] for p in valid],
+                         weights=[SOURCE_WEIGHTS.get(p["source"], 1.0) for p in valid])
+    if stats["rejected"]:
+        rejected = [p["source"] for p, inlier in zip(valid, stats["inliers"]) if not inlier]
+        print(f"⚠️  Ignoring outlier prices from: {', '.join(rejected)}")
+    avg_price = round(stats["mean"], 2)
+    min_price = round(stats["min"], 2)
+    max_price = round(stats["max"], 2)
+    
+    # Add to history, keeping only the last 30 days of data
+    new_price = prices_store.append({
+        "average_price": avg_price,
+        "min_price": min_price,
+        "max_price": max_price,
+        "source_count": stats["count"],
+        "sources": scraped_prices,
+        "timestamp": datetime.now().isoformat()
+    }, keep_days=30)
+    
+    print(f"✅ Price updated: ₹{avg_price} (min: ₹{min_price}, max: ₹{max_price})")
+    data_changed()
+    return new_price
+
+def price_reference():
+    """Median/MAD of the latest scraped prices, to flag outlying submissions"""
+    latest_price = prices_store.latest()
+    if not latest_price:
+        return None
+    return robust_stats([s["price"] for s in latest_price.get("sources", []) if 10 <= s["price"] <= 100])
+
+# Scheduled refreshes, run by one worker; concurrent manual refreshes share one run
+refresh_lock = FileLock(REFRESH_LOCK_FILE)
+refresher = RefreshScheduler(refresh_prices, REFRESH_INTERVAL,
+                             leader=FileLock(SCHEDULER_LOCK_FILE), last_refresh=last_refresh)
+
+def start_background_tasks():
+    """Start the compactor, scheduled refreshes and the event watcher"""
+    if isinstance(submissions_store, SubmissionLog):
+        submissions_store.start_compactor(COMPACT_INTERVAL)
+    refresher.start()
+    # Writes made by other worker processes reach this worker's subscribers too
+    broadcaster.watch(lambda: data_version.current()[0], publish_updates)
+
+if not PRELOAD:
+    start_background_tasks()
+
 @app.route('/api/price/refresh', methods=['POST'])
 def refresh_price():
     """Manually refresh coconut price"""
     try:
-        print("🔄 Refreshing coconut prices...")
+        job = refresher.trigger()
         
-        # For demo purposes, we'll simulate scraping
-        # In production, uncomment the real scraping:
-        # scraped_prices = scraper.scrape_all_sources()
-        
-        # Simulated scraping for demo
-        scraped_prices = [
-            {"source": "commodityonline", "price": random.randint(26, 32), "timestamp": datetime.now().isoformat()},
-            {"source": "commoditymarketlive", "price": random.randint(27, 31), "timestamp": datetime.now().isoformat()},
-            {"source": "kisantak", "price": random.randint(25, 30), "timestamp": datetime.now().isoformat()},
-            {"source": "krishidunia", "price": random.randint(28, 33), "timestamp": datetime.now().isoformat()},
-            {"source": "krishidunia", "price": random.randint(27, 32), "timestamp": datetime.now().isoformat()}
-        ]
-        
-        print(f"📊 Scraped {len(scraped_prices)} prices")
+        # ?wait=false returns straight away; the new price shows up in /api/price
+        if request.args.get('wait', 'true').lower() == 'false':
+            return jsonify({
+                "success": True,
+                "message": "Price refresh started"
+            }), 202
         
-        # Extract valid prices
-        valid_prices = [p["price"] for p in scraped_prices if 10 <= p["price"] <= 100]
+        new_price = job.result()
         
-        if not valid_prices:
+        if not new_price:
             return jsonify({
                 "success": False,
                 "message": "No valid prices found from sources"
             }), 400
         
-        # Calculate statistics
-        avg_price = round(sum(valid_prices) / len(valid_prices), 2)
-        min_price = round(min(valid_prices), 2)
-        max_price = round(max(valid_prices), 2)
-        
-        # Load existing prices
-        prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
-        
-        # Create new price entry
-        new_price = {
-            "id": len(prices_data["prices"]) + 1,
-            "average_price": avg_price,
-            "min_price": min_price,
-            "max_price": max_price,
-            "source_count": len(valid_prices),
-            "sources": scraped_prices,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Add to history
-        prices_data["prices"].append(new_price)
-        
-        # Keep only last 30 days of data
-        cutoff_date = datetime.now() - timedelta(days=30)
-        prices_data["prices"] = [
-            p for p in prices_data["prices"] 
-            if datetime.fromisoformat(p["timestamp"].replace('Z', '+00:00')) > cutoff_date
-        ]
-        
-        # Update IDs
-        for i, price in enumerate(prices_data["prices"], 1):
-            price["id"] = i
-        
-        prices_data["last_updated"] = datetime.now().isoformat()
-        
-        # Save to file
-        save_json_file(PRICES_FILE, prices_data)
-        
-        print(f"✅ Price updated: ₹{avg_price} (min: ₹{min_price}, max: ₹{max_price})")
-        
         return jsonify({
             "success": True,
             "data": new_price,
-            "message": f"Price refreshed: ₹{avg_price} per coconut"
+            "message": f"Price refreshed: ₹{new_price['average_price']} per coconut"
         })
         
     except Exception as e:
@@ -157,15 +389,105 @@ def refresh_price():
             "message": f"Error: {str(e)}"
         }), 500
 
+def parse_time_arg(value):
+    """Query string time (ISO date/datetime or epoch seconds) to epoch seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return parse_timestamp(value)
+
+def encode_cursor(record):
+    """Opaque token for the (timestamp, id) key of the last row of a page"""
+    key = json.dumps([record.get("timestamp") or '', record["id"]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    """(timestamp, id) key from a cursor token; raises ValueError if it is malformed"""
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not isinstance(record_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, record_id
+
+def page_args():
+    """limit and decoded cursor of a paginated request; raises ValueError if invalid"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be a number")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Get price history"""
-    days = int(request.args.get('days', 7))
+    """Get price history for the last N days, or between ?from= and ?to="""
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+        days = int(request.args.get('days', 7))
+        if start is None and end is None:
+            start = (datetime.now() - timedelta(days=days)).timestamp()
+    except (ValueError, OverflowError):
+        return jsonify({
+            "success": False,
+            "message": "'from' and 'to' must be ISO dates or epoch seconds, and 'days' a number"
+        }), 400
     
-    prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
+    # Pre-aggregated OHLC buckets instead of raw entries
+    resolution = request.args.get('resolution')
+    if resolution:
+        if resolution not in RESOLUTIONS:
+            return jsonify({
+                "success": False,
+                "message": f"resolution must be one of: {', '.join(RESOLUTIONS)}"
+            }), 400
+        
+        buckets = prices_store.buckets(resolution, start, end)
+        return jsonify({
+            "success": True,
+            "data": {
+                "resolution": resolution,
+                "buckets": [b.to_dict() for b in buckets],
+                "chart_data": [b.chart_point() for b in buckets]
+            },
+            "count": len(buckets)
+        })
     
-    # Return requested number of days
-    history = prices_data["prices"][-days:] if days <= len(prices_data["prices"]) else prices_data["prices"]
+    next_cursor = None
+    if 'limit' in request.args or 'cursor' in request.args:
+        try:
+            limit, after = page_args()
+            if after:
+                # Skip straight to the cursor; the slack covers the round trip through epoch seconds
+                resume = parse_timestamp(after[0]) - 0.001
+                start = resume if start is None else max(start, resume)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "message": str(e)
+            }), 400
+        history = []
+        for entry in prices_store.iter_between(start, end):
+            if after and (entry["timestamp"], entry["id"]) <= after:
+                continue
+            history.append(entry)
+            if len(history) > limit:
+                break
+        if len(history) > limit:
+            history = history[:limit]
+            next_cursor = encode_cursor(history[-1])
+    else:
+        history = prices_store.between(start, end)
+    
+    # Leave out the per-source samples to keep chart payloads small
+    if request.args.get('include_sources', 'true').lower() == 'false':
+        history = [{k: v for k, v in p.items() if k != 'sources'} for p in history]
     
     # Format for charts
     chart_data = []
@@ -184,9 +506,26 @@ def get_history():
             "prices": history,
             "chart_data": chart_data
         },
-        "count": len(history)
+        "count": len(history),
+        "next_cursor": next_cursor
     })
 
+def store_submission(submission):
+    """Store one submission and return it with its id"""
+    if submission_writer:
+        return submission_writer.add(submission)
+    submission = submissions_store.add(submission)
+    data_changed()
+    return submission
+
+def store_submissions(submissions):
+    """Store submissions in one write and return them with their ids"""
+    if submission_writer:
+        return submission_writer.add_many(submissions)
+    stored = submissions_store.add_many(submissions)
+    data_changed()
+    return stored
+
 @app.route('/api/verify', methods=['POST'])
 def verify_price():
     """User verifies if price is correct"""
@@ -205,8 +544,8 @@ def verify_price():
         market = data.get('market', '')
         
         # Get current price for reference
-        prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
-        current_avg = prices_data["prices"][-1]["average_price"] if prices_data["prices"] else 0
+        latest_price = prices_store.latest()
+        current_avg = latest_price["average_price"] if latest_price else 0
         
         if is_correct:
             print(f"✅ User confirmed price ₹{current_avg} is correct for {district}")
@@ -230,10 +569,7 @@ def verify_price():
             print(f"📝 User submitted correction: ₹{user_price} for {district} (market: {market})")
             
             # Save user submission
-            submissions = load_json_file(SUBMISSIONS_FILE, [])
-            
-            submission = {
-                "id": len(submissions) + 1,
+            submission = store_submission({
                 "type": "correction",
                 "user_price": float(user_price),
                 "system_price": current_avg,
@@ -241,11 +577,9 @@ def verify_price():
                 "market": market,
                 "timestamp": datetime.now().isoformat(),
                 "status": "pending",
-                "notes": "User reported incorrect price"
-            }
-            
-            submissions.append(submission)
-            save_json_file(SUBMISSIONS_FILE, submissions)
+                "notes": "User reported incorrect price",
+                "outlier": is_outlier(float(user_price), price_reference())
+            })
             
             return jsonify({
                 "success": True,
@@ -260,37 +594,48 @@ def verify_price():
             "message": f"Error: {str(e)}"
         }), 500
 
+def build_submission(data):
+    """Validate a submitted price; returns (submission, error message)"""
+    if not isinstance(data, dict):
+        return None, "Submission must be a JSON object"
+    
+    required = ['price', 'district']
+    for field in required:
+        if field not in data:
+            return None, f"Missing required field: {field}"
+    
+    try:
+        user_price = float(data['price'])
+    except (TypeError, ValueError):
+        return None, f"Invalid price: {data['price']}"
+    
+    return {
+        "type": "new_submission",
+        "user_price": user_price,
+        "district": data['district'],
+        "market": data.get('market', ''),
+        "contact": data.get('contact', ''),
+        "timestamp": datetime.now().isoformat(),
+        "status": "pending",
+        "notes": data.get('notes', '')
+    }, None
+
 @app.route('/api/submit', methods=['POST'])
 def submit_price():
     """User submits new price"""
     try:
         data = request.json
         
-        required = ['price', 'district']
-        for field in required:
-            if field not in data:
-                return jsonify({
-                    "success": False,
-                    "message": f"Missing required field: {field}"
-                }), 400
+        submission, error = build_submission(data)
+        if error:
+            return jsonify({
+                "success": False,
+                "message": error
+            }), 400
         
         # Save user submission
-        submissions = load_json_file(SUBMISSIONS_FILE, [])
-        
-        submission = {
-            "id": len(submissions) + 1,
-            "type": "new_submission",
-            "user_price": float(data['price']),
-            "district": data['district'],
-            "market": data.get('market', ''),
-            "contact": data.get('contact', ''),
-            "timestamp": datetime.now().isoformat(),
-            "status": "pending",
-            "notes": data.get('notes', '')
-        }
-        
-        submissions.append(submission)
-        save_json_file(SUBMISSIONS_FILE, submissions)
+        submission["outlier"] = is_outlier(submission["user_price"], price_reference())
+        submission = store_submission(submission)
         
         print(f"📥 New price submission: ₹{data['price']} from {data['district']}")
         
@@ -307,56 +652,91 @@ def submit_price():
             "message": f"Error: {str(e)}"
         }), 500
 
+@app.route('/api/submit/batch', methods=['POST'])
+def submit_batch():
+    """Submit many prices at once (JSON array or NDJSON), stored in one write"""
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            items = []
+            for line in request.get_data(as_text=True).splitlines():
+                if line.strip():
+                    try:
+                        items.append(json.loads(line))
+                    except ValueError:
+                        items.append(None)
+        else:
+            items = request.get_json(silent=True)
+            if isinstance(items, dict):
+                items = items.get('submissions')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "success": False,
+                "message": "Expected a non-empty array of submissions"
+            }), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                "success": False,
+                "message": f"At most {MAX_BATCH_SIZE} submissions per batch"
+            }), 413
+        
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            submission, error = build_submission(item)
+            if error:
+                results.append({"index": index, "success": False, "message": error})
+            else:
+                results.append({"index": index, "success": True})
+                valid.append((index, submission))
+        
+        reference = price_reference()
+        if reference and valid:
+            flags = outlier_flags([s["user_price"] for _, s in valid], reference["median"], reference["mad"])
+            for (_, submission), flag in zip(valid, flags):
+                submission["outlier"] = flag
+        
+        # One storage write for the whole batch
+        stored = store_submissions([s for _, s in valid]) if valid else []
+        for (index, _), submission in zip(valid, stored):
+            results[index]["id"] = submission["id"]
+        
+        print(f"📥 Batch submission: {len(stored)} stored, {len(items) - len(stored)} rejected")
+        
+        return jsonify({
+            "success": bool(stored),
+            "message": f"{len(stored)} of {len(items)} submissions stored for admin review",
+            "data": results,
+            "stored": len(stored),
+            "rejected": len(items) - len(stored)
+        })
+        
+    except Exception as e:
+        print(f"❌ Error in batch submission: {e}")
+        return jsonify({
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }), 500
+
 @app.route('/api/districts', methods=['GET'])
 def get_district_prices():
     """Get district-wise prices"""
     try:
-        prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
+        latest_price = prices_store.latest()
         
-        if not prices_data["prices"]:
+        if not latest_price:
             return jsonify({
                 "success": False,
                 "message": "No price data available"
             }), 404
         
-        latest_price = prices_data["prices"][-1]
         base_price = latest_price["average_price"]
         
-        # Tamil Nadu districts with price variations
-        tamil_nadu_districts = [
-            "Chennai", "Coimbatore", "Madurai", "Thanjavur", "Trichy", 
-            "Salem", "Erode", "Tirunelveli", "Vellore", "Thoothukudi",
-            "Dindigul", "Kanyakumari", "Kanchipuram", "Tiruvallur", "Cuddalore",
-            "Nagapattinam", "Pudukkottai", "Sivaganga", "Ramanathapuram", "Virudhunagar",
-            "Theni", "Namakkal", "Dharmapuri", "Krishnagiri", "Ariyalur", "Perambalur"
-        ]
-        
-        # Generate district prices with realistic variations
-        districts_data = []
-        for district in tamil_nadu_districts[:12]:  # Show first 12 districts
-            # Create some variation (-3 to +3 from base price)
-            variation = random.uniform(-3, 3)
-            district_price = round(base_price + variation, 1)
-            
-            # Ensure price is reasonable
-            district_price = max(20, min(35, district_price))
-            
-            # Determine trend
-            trend_variation = random.choice([-2, -1, 0, 0, 1, 2, 2])
-            trend = f"{'+' if trend_variation >= 0 else ''}{trend_variation}%"
-            
-            # Min and max range
-            min_price = round(district_price * 0.9, 1)
-            max_price = round(district_price * 1.1, 1)
-            
-            districts_data.append({
-                "district": district,
-                "price": district_price,
-                "min": min_price,
-                "max": max_price,
-                "trend": trend,
-                "source_count": random.randint(2, 5)
-            })
+        # Approved submissions per district, maintained as they come in;
+        # districts nobody has reported on yet show the scraped state average
+        submissions_store.sync()
+        districts_data = district_view.districts(state_average=base_price)
         
         # Sort by price (highest first)
         districts_data.sort(key=lambda x: x["price"], reverse=True)
@@ -367,6 +747,7 @@ def get_district_prices():
                 "districts": districts_data,
                 "state_average": base_price,
                 "total_districts": len(districts_data),
+                "reported_districts": sum(1 for d in districts_data if d["source"] == "submissions"),
                 "last_updated": latest_price["timestamp"]
             }
         })
@@ -380,22 +761,36 @@ def get_district_prices():
 
 @app.route('/api/submissions', methods=['GET'])
 def get_submissions():
-    """Get all user submissions"""
+    """Get one page of user submissions, oldest first (or newest with ?order=desc)"""
+    district = request.args.get('district')
+    order = request.args.get('order', 'asc')
     try:
-        submissions = load_json_file(SUBMISSIONS_FILE, [])
-        
-        # Filter by status if provided
-        status_filter = request.args.get('status')
-        if status_filter:
-            filtered = [s for s in submissions if s.get('status') == status_filter]
-        else:
-            filtered = submissions
+        limit, after = page_args()
+        if district and normalize_district(district) is None:
+            raise ValueError(f"Unknown district: {district}")
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be asc or desc")
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    
+    try:
+        # Filters are applied before the limit; one extra row tells if there is a next page
+        page = submissions_store.page(request.args.get('status'), normalize_district(district), after,
+                                      limit + 1, descending=order == 'desc')
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1])
         
         return jsonify({
             "success": True,
-            "data": filtered,
-            "count": len(filtered),
-            "pending_count": len([s for s in submissions if s.get('status') == 'pending'])
+            "data": page,
+            "count": len(page),
+            "next_cursor": next_cursor,
+            "pending_count": submissions_store.count('pending')
         })
         
     except Exception as e:
@@ -405,45 +800,109 @@ def get_submissions():
             "message": f"Error: {str(e)}"
         }), 500
 
-@app.route('/api/stats', methods=['GET'])
-def get_stats():
-    """Get statistics about the system"""
+@app.route('/api/submissions/outliers', methods=['GET'])
+def get_submission_outliers():
+    """Per-district median/MAD of recent submissions and the ones that stand out"""
+    try:
+        hours = int(request.args.get('hours', 24))
+        since = (datetime.now() - timedelta(hours=hours)).isoformat()
+    except (ValueError, OverflowError):
+        return jsonify({
+            "success": False,
+            "message": "hours must be a number"
+        }), 400
+    
     try:
-        prices_data = load_json_file(PRICES_FILE, {"prices": [], "last_updated": None})
-        submissions = load_json_file(SUBMISSIONS_FILE, [])
+        district_index = {name: i for i, name in enumerate(TAMIL_NADU_DISTRICTS)}
+        records, groups, prices = [], [], []
+        for submission in submissions_store.iter(start=since):
+            district = normalize_district(submission.get("district"))
+            price = submission.get("user_price")
+            if district is None or price is None or submission.get("status") == 'rejected':
+                continue
+            records.append(submission)
+            groups.append(district_index[district])
+            prices.append(price)
         
-        if not prices_data["prices"]:
+        stats, flags = group_outliers(groups, prices)
+        districts = [{
+            "district": TAMIL_NADU_DISTRICTS[group],
+            "median": round(figures["median"], 2),
+            "mad": round(figures["mad"], 2),
+            "count": figures["count"]
+        } for group, figures in sorted(stats.items())]
+        outliers = [record for record, flag in zip(records, flags) if flag]
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "districts": districts,
+                "outliers": outliers
+            },
+            "count": len(outliers),
+            "checked": len(records)
+        })
+        
+    except Exception as e:
+        print(f"❌ Error checking submissions: {e}")
+        return jsonify({
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }), 500
+
+@app.route('/api/submissions/<int:submission_id>/status', methods=['POST'])
+def update_submission_status(submission_id):
+    """Admin approves or rejects a submission"""
+    try:
+        data = request.json or {}
+        status = data.get('status')
+        
+        if status not in SUBMISSION_STATUSES:
             return jsonify({
                 "success": False,
-                "message": "No price data available"
+                "message": f"status must be one of: {', '.join(SUBMISSION_STATUSES)}"
+            }), 400
+        
+        submission = submissions_store.get(submission_id)
+        if not submission:
+            return jsonify({
+                "success": False,
+                "message": "Submission not found"
             }), 404
         
-        latest_price = prices_data["prices"][-1]
+        submission = submissions_store.update({
+            **submission,
+            "status": status,
+            "reviewed_at": datetime.now().isoformat()
+        })
+        data_changed()
         
-        # Calculate 7-day average
-        last_7_days = prices_data["prices"][-7:] if len(prices_data["prices"]) >= 7 else prices_data["prices"]
-        seven_day_avg = round(sum(p["average_price"] for p in last_7_days) / len(last_7_days), 2)
+        print(f"🗳️  Submission {submission['id']} marked {status}")
         
-        # Calculate weekly change
-        if len(prices_data["prices"]) >= 2:
-            current = latest_price["average_price"]
-            previous = prices_data["prices"][-2]["average_price"] if len(prices_data["prices"]) >= 2 else current
-            weekly_change = round(((current - previous) / previous) * 100, 1)
-        else:
-            weekly_change = 0
+        return jsonify({
+            "success": True,
+            "message": f"Submission {status}",
+            "data": submission
+        })
         
-        stats = {
-            "current_price": latest_price["average_price"],
-            "min_today": latest_price["min_price"],
-            "max_today": latest_price["max_price"],
-            "source_count": latest_price["source_count"],
-            "seven_day_average": seven_day_avg,
-            "weekly_change": f"{'+' if weekly_change >= 0 else ''}{weekly_change}%",
-            "total_submissions": len(submissions),
-            "pending_submissions": len([s for s in submissions if s.get('status') == 'pending']),
-            "data_points": len(prices_data["prices"]),
-            "last_updated": latest_price["timestamp"]
-        }
+    except Exception as e:
+        print(f"❌ Error updating submission: {e}")
+        return jsonify({
+            "success": False,
+            "message": f"Error: {str(e)}"
+        }), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get statistics about the system"""
+    try:
+        stats = current_stats()
+        
+        if not stats:
+            return jsonify({
+                "success": False,
+                "message": "No price data available"
+            }), 404
         
         return jsonify({
             "success": True,
@@ -457,6 +916,104 @@ def get_stats():
             "message": f"Error: {str(e)}"
         }), 500
 
+def stream_export(rows, export_format, columns, name):
+    """Streaming NDJSON or CSV response that never holds more than a chunk of rows"""
+    def generate_ndjson():
+        chunk = []
+        for row in rows:
+            chunk.append(json.dumps(row))
+            if len(chunk) >= 500:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for i, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if i % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    if export_format == 'csv':
+        response = Response(generate_csv(), mimetype='text/csv')
+    else:
+        response = Response(generate_ndjson(), mimetype='application/x-ndjson')
+    extension = 'csv' if export_format == 'csv' else 'ndjson'
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{extension}'
+    return response
+
+def export_args():
+    """format, from and to of an export request; raises ValueError if invalid"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        raise ValueError("format must be ndjson or csv")
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+    except ValueError:
+        raise ValueError("'from' and 'to' must be ISO dates or epoch seconds")
+    return export_format, start, end
+
+@app.route('/api/events', methods=['GET'])
+def events():
+    """Server-Sent Events: the current price and stats, then only what changes"""
+    # Make sure a new subscriber's snapshot is current
+    publish_updates(force=True)
+    stream = broadcaster.stream(request.headers.get('Last-Event-ID'))
+    if stream is None:
+        # Don't let streams take every request thread; clients poll instead
+        return jsonify({
+            "success": False,
+            "message": "Too many event streams open, poll /api/price and /api/stats instead"
+        }), 503, {'Retry-After': '60'}
+    
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, storage and scraper metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/export/history', methods=['GET'])
+def export_history():
+    """Stream price history as NDJSON or CSV (?format=, ?from=, ?to=)"""
+    try:
+        export_format, start, end = export_args()
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    
+    rows = prices_store.iter_between(start, end)
+    if request.args.get('include_sources', 'true').lower() == 'false':
+        rows = ({k: v for k, v in p.items() if k != 'sources'} for p in rows)
+    return stream_export(rows, export_format, PRICE_EXPORT_COLUMNS, 'price_history')
+
+@app.route('/api/export/submissions', methods=['GET'])
+def export_submissions():
+    """Stream submissions as NDJSON or CSV (?format=, ?status=, ?from=, ?to=)"""
+    try:
+        export_format, start, end = export_args()
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+    
+    # Submission timestamps are naive local ISO strings
+    start = datetime.fromtimestamp(start).isoformat() if start is not None else None
+    end = datetime.fromtimestamp(end).isoformat() if end is not None else None
+    rows = submissions_store.iter(request.args.get('status'), start, end)
+    return stream_export(rows, export_format, SUBMISSION_EXPORT_COLUMNS, 'submissions')
+
 if __name__ == '__main__':
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
@@ -472,11 +1029,21 @@ if __name__ == '__main__':
     print("  GET  /api/history         - Get price history")
     print("  POST /api/verify          - Verify price (YES/NO)")
     print("  POST /api/submit          - Submit new price")
+    print("  POST /api/submit/batch    - Submit many prices")
     print("  GET  /api/districts       - Get district prices")
-    print("  GET  /api/submissions     - Get user submissions")
+    print("  GET  /api/submissions     - Get user submissions (paged)")
+    print("  GET  /api/submissions/outliers - Outlying submissions per district")
+    print("  POST /api/submissions/<id>/status - Approve/reject a submission")
     print("  GET  /api/stats           - Get system statistics")
+    print("  GET  /api/export/history  - Export price history (NDJSON/CSV)")
+    print("  GET  /api/export/submissions - Export submissions (NDJSON/CSV)")
+    print("  GET  /api/events          - Live price/stats updates (SSE)")
+    print("  GET  /metrics             - Prometheus metrics")
     print("")
     print("Sample data has been loaded from prices.json")
+    if REFRESH_INTERVAL > 0:
+        print(f"Prices refresh in the background every {REFRESH_INTERVAL}s")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server; production runs wsgi.py
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('COCONUT_DEBUG', 'true').lower() != 'false')
\ No newline at end of file
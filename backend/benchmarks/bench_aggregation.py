@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Per-district median/MAD outlier flags over a day of submissions.
+
+Generates a day of synthetic submissions across every Tamil Nadu
+district (a few percent of them wildly off) and times group_outliers,
+with numpy if it is installed and with the plain Python fallback.
+
+    cd backend && python benchmarks/bench_aggregation.py [submissions]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import aggregation
+from districts import TAMIL_NADU_DISTRICTS
+
+SUBMISSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+OUTLIER_RATE = 0.02
+REPEAT = 5
+
+
+def synthetic_day(count, seed=42):
+    rng = random.Random(seed)
+    base = {i: rng.uniform(24, 34) for i in range(len(TAMIL_NADU_DISTRICTS))}
+    groups, prices = [], []
+    for _ in range(count):
+        group = rng.randrange(len(TAMIL_NADU_DISTRICTS))
+        price = rng.gauss(base[group], 1.2)
+        if rng.random() < OUTLIER_RATE:
+            price *= rng.choice([0.3, 3.0])
+        groups.append(group)
+        prices.append(round(price, 1))
+    return groups, prices
+
+
+def timed(groups, prices):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        stats, flags = aggregation.group_outliers(groups, prices)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"ms": round(best * 1000, 2), "districts": len(stats), "outliers": sum(flags)}, flags
+
+
+def main():
+    groups, prices = synthetic_day(SUBMISSIONS)
+    results = {"submissions": SUBMISSIONS, "districts": len(TAMIL_NADU_DISTRICTS)}
+
+    numpy = aggregation.numpy
+    if numpy is not None:
+        results["numpy"], numpy_flags = timed(numpy.asarray(groups), numpy.asarray(prices))
+    aggregation.numpy = None
+    results["python"], python_flags = timed(groups, prices)
+    aggregation.numpy = numpy
+    if numpy is not None:
+        results["same_flags"] = numpy_flags == python_flags
+        results["speedup"] = round(results["python"]["ms"] / results["numpy"]["ms"], 1)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
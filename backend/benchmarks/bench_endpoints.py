@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Latency and throughput of every API endpoint, per storage backend and dataset size.
+
+For each storage backend and dataset size a synthetic dataset is written
+to a temporary directory by setup.generate, the app is imported there in a fresh process
+and every route is exercised through the Flask test client from
+``--concurrency`` threads. Results (p50/p90/p99/mean latency in ms and
+requests per second) are written as JSON. Repeated reads are mostly
+answered from the app's response cache, so the reads are also measured
+in a process started with ``COCONUT_RESPONSE_CACHE=0``, reported under
+``uncached_endpoints``.
+
+    cd backend && python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --sizes 100,100000,1000000 \\
+        --storage json,columnar,sqlite --output results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+STORAGE_BACKENDS = ('json', 'columnar', 'sqlite')
+
+
+def endpoint_cases():
+    """(name, method, path, request kwargs) for every route.
+
+    Reads come first: the writes change the dataset (a refresh drops
+    history older than 30 days).
+    """
+    batch = [{"price": 29 + i % 3, "district": "Salem", "market": "Benchmark"} for i in range(100)]
+    return [
+        ("home", 'GET', '/', {}),
+        ("get_price", 'GET', '/api/price', {}),
+        ("get_price (304)", 'GET', '/api/price', {"revalidate": True}),
+        ("get_history", 'GET', '/api/history', {}),
+        ("get_history (7 days, daily)", 'GET', '/api/history?days=7&resolution=day', {}),
+        ("get_district_prices", 'GET', '/api/districts', {}),
+        ("get_submissions", 'GET', '/api/submissions', {}),
+        ("get_submissions (pending)", 'GET', '/api/submissions?status=pending', {}),
+        ("get_submission_outliers", 'GET', '/api/submissions/outliers', {}),
+        ("get_stats", 'GET', '/api/stats', {}),
+        ("export_history (csv)", 'GET', '/api/export/history?format=csv', {}),
+        ("export_submissions (ndjson)", 'GET', '/api/export/submissions', {}),
+        ("metrics", 'GET', '/metrics', {}),
+        ("refresh_price", 'POST', '/api/price/refresh', {}),
+        ("verify_price", 'POST', '/api/verify',
+         {"json": {"is_correct": False, "price": 31, "district": "Madurai", "market": "Benchmark"}}),
+        ("submit_price", 'POST', '/api/submit', {"json": {"price": 30, "district": "Chennai", "market": "Benchmark"}}),
+        ("submit_batch (100)", 'POST', '/api/submit/batch', {"json": batch}),
+        ("update_submission_status", 'POST', '/api/submissions/1/status', {"json": {"status": "approved"}}),
+    ]
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def measure(app, method, path, kwargs, requests, concurrency, max_seconds):
+    """Send requests from several threads; latency stats in ms and throughput"""
+    kwargs = dict(kwargs)
+    headers = {}
+    if kwargs.pop("revalidate", False):
+        headers["If-None-Match"] = app.test_client().get(path).headers.get("ETag", '')
+    for _ in range(3):
+        app.test_client().open(path, method=method, headers=headers, **kwargs).get_data()
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + max_seconds
+    remaining = [requests]
+
+    def run():
+        client = app.test_client()
+        while True:
+            with lock:
+                if remaining[0] <= 0 or (len(latencies) >= 5 and time.perf_counter() > deadline):
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            response = client.open(path, method=method, headers=headers, **kwargs)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p90_ms": round(percentile(latencies, 0.9), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "max_ms": round(latencies[-1], 3),
+        "requests_per_second": round(len(latencies) / wall, 1)
+    }
+
+
+def run_worker(args):
+    """Benchmark one prepared dataset directory (runs in its own process)
+
+    With ``--no-cache`` the response cache is off and only the reads are
+    measured, leaving the dataset as it was.
+    """
+    os.chdir(args.worker)
+    os.environ['COCONUT_STORAGE'] = args.storage[0]
+    os.environ['COCONUT_RESPONSE_CACHE'] = '0' if args.no_cache else '1'
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        import app as appmod
+        import_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        appmod.prices_store.count()
+        appmod.submissions_store.count()
+        load_seconds = time.perf_counter() - start
+        endpoints = {}
+        for name, method, path, kwargs in endpoint_cases():
+            if args.no_cache and method != 'GET':
+                continue
+            endpoints[name] = measure(appmod.app, method, path, kwargs,
+                                      args.requests, args.concurrency, args.max_seconds)
+    print(json.dumps({
+        "import_seconds": round(import_seconds, 3),
+        "first_load_seconds": round(load_seconds, 3),
+        "endpoints": endpoints
+    }))
+
+
+def prepare(directory, storage, submissions, history_hours, seed):
+    """Generate the dataset straight into the storage backend's format"""
+    import setup
+    setup.generate(os.path.join(directory, 'data'), storage, history_hours, submissions, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,100000',
+                        help="comma-separated submission counts")
+    parser.add_argument('--history-hours', type=int, default=None,
+                        help="hourly price entries per dataset (default: same as the submission count, "
+                             "capped at two years)")
+    parser.add_argument('--storage', default='json,columnar,sqlite',
+                        help=f"comma-separated storage backends ({', '.join(STORAGE_BACKENDS)})")
+    parser.add_argument('--requests', type=int, default=200, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=1, help="client threads")
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help="stop an endpoint early after this long (at least 5 requests)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--no-cache', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.storage = args.storage.split(',')
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        history_hours = args.history_hours or min(size, 2 * 365 * 24)
+        for storage in args.storage:
+            directory = tempfile.mkdtemp(prefix='coconut-bench-')
+            try:
+                start = time.perf_counter()
+                prepare(directory, storage, size, history_hours, args.seed)
+                setup_seconds = time.perf_counter() - start
+                print(f"⏱️  {storage}: {size} submissions, {history_hours} hours of prices...", file=sys.stderr)
+                def worker(*flags):
+                    return json.loads(subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--worker', directory, '--storage', storage,
+                         '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+                         '--max-seconds', str(args.max_seconds), *flags],
+                        env={**os.environ, 'PYTHONPATH': os.path.abspath(BACKEND)},
+                        capture_output=True, text=True, check=True).stdout)
+                # Reads only, so it runs first on the untouched dataset
+                uncached = worker('--no-cache')
+                results.append({
+                    "storage": storage,
+                    "submissions": size,
+                    "history_hours": history_hours,
+                    "setup_seconds": round(setup_seconds, 3),
+                    **worker(),
+                    "uncached_endpoints": uncached["endpoints"]
+                })
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    report = json.dumps({
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "requests_per_endpoint": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "results": results
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
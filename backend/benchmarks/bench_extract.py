@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Parse time and peak memory of the price extraction strategies.
+
+Runs each strategy over the recorded pages in benchmarks/fixtures (or
+the files given) and reports the best of several runs and the
+tracemalloc peak:
+
+- soup_regex: the old path, a full BeautifulSoup tree + regex over get_text()
+- soup_strainer: BeautifulSoup building only <table> elements
+- stream_full: TableExtractor with html.parser over the whole page
+- stream_slice: TableExtractor with html.parser over the anchored table
+- lxml_slice: TableExtractor with lxml's target parser (if lxml is installed)
+
+    cd backend && python benchmarks/bench_extract.py [page.html ...]
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import extractors
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REPEAT = 20
+
+
+def soup_regex(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [int(p) for p in re.findall(r'₹\s*(\d+)', soup.get_text())[:3]]
+
+
+def soup_strainer(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table'))
+    for table in soup.find_all('table'):
+        rows = [[' '.join(cell.get_text().split()) for cell in tr.find_all(['td', 'th'])]
+                for tr in table.find_all('tr')]
+        if rows and 'modal price' in (cell.lower() for cell in rows[0]):
+            return rows[1:]
+    return []
+
+
+def strategies(source):
+    registered = extractors.get_extractor(source)
+    anchor = getattr(registered, 'anchor', None)
+    scale = getattr(registered, 'scale', 1)
+    found = {
+        "soup_regex": soup_regex,
+        "soup_strainer": soup_strainer,
+        "stream_full": extractors.TableExtractor(scale=scale, use_lxml=False).extract,
+        "stream_slice": extractors.TableExtractor(anchor=anchor, scale=scale, use_lxml=False).extract,
+    }
+    if extractors.etree is not None:
+        found["lxml_slice"] = extractors.TableExtractor(anchor=anchor, scale=scale).extract
+    return found
+
+
+def measure(function, html):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    function(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(best * 1000, 3), "peak_kb": round(peak / 1024, 1), "rows": len(result)}
+
+
+def main():
+    pages = sys.argv[1:] or sorted(glob.glob(os.path.join(FIXTURES, '*.html')))
+    results = []
+    for path in pages:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        source = os.path.splitext(os.path.basename(path))[0]
+        timings = {name: measure(function, html) for name, function in strategies(source).items()}
+        baseline = timings["soup_regex"]["ms"]
+        for timing in timings.values():
+            timing["speedup"] = round(baseline / timing["ms"], 1) if timing["ms"] else None
+        results.append({
+            "page": os.path.basename(path),
+            "bytes": len(html.encode()),
+            "extractor": type(extractors.get_extractor(source)).__name__,
+            "strategies": timings
+        })
+    print(json.dumps({"lxml": extractors.etree is not None, "pages": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
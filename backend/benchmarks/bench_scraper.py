@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Sequential vs concurrent scraping against a local stub HTTP server.
+
+Runs offline: every source is served from 127.0.0.1 with an artificial
+delay, and one source never answers in time to show the partial result.
+
+    cd backend && python benchmarks/bench_scraper.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from scraper import CoconutPriceScraper
+
+SOURCE_DELAY = 0.3
+SLOW_DELAY = 3.0
+SOURCE_NAMES = ["commodityonline", "commoditymarketlive", "kisantak",
+                "krishidunia_mandirates", "krishidunia_mandibhav"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(SLOW_DELAY if self.path == '/slow' else SOURCE_DELAY)
+        body = '<html><body><td>Coconut</td><td>₹ 28</td><td>₹ 31</td></body></html>'.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    server = start_stub_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    sources = {name: f"{base}/{name}" for name in SOURCE_NAMES}
+    # No response cache or host spacing: every source is the same stub host
+    scraper = CoconutPriceScraper(sources=sources, cache_dir=None, min_host_interval=0)
+
+    start = time.perf_counter()
+    sequential = []
+    for name, url in sources.items():
+        sequential.extend(scraper.scrape_source(name, url))
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = scraper.scrape_all_sources_concurrent(timeout=2, deadline=2)
+    concurrent_time = time.perf_counter() - start
+
+    slow_scraper = CoconutPriceScraper(sources={**sources, "slow": f"{base}/slow"},
+                                       cache_dir=None, min_host_interval=0)
+    start = time.perf_counter()
+    partial = slow_scraper.scrape_all_sources_concurrent(timeout=1, deadline=1)
+    partial_time = time.perf_counter() - start
+
+    server.shutdown()
+    print(json.dumps({
+        "sources": len(sources),
+        "source_delay_s": SOURCE_DELAY,
+        "sequential": {"seconds": round(sequential_time, 3), "prices": len(sequential)},
+        "concurrent": {"seconds": round(concurrent_time, 3), "prices": len(concurrent)},
+        "with_slow_source": {"seconds": round(partial_time, 3), "prices": len(partial)},
+        "speedup": round(sequential_time / concurrent_time, 1)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+"""Compact binary format for price history.
+
+prices.json repeats every key, source name and ISO timestamp per entry.
+A .cph file stores the same history column by column instead:
+
+    header   magic, meta length, row count, sample count
+    meta     JSON: source names, byte order, last_updated
+    columns  id, timestamp, average/min/max price, source count and the
+             offset of each row's samples, then the samples' source
+             index, price and timestamp; each column 8-byte aligned
+
+Timestamps are epoch microseconds, sources are indexes into the name
+table. Columns are read as memoryviews over an mmap of the file, so
+loading history builds no per-entry objects; a dict is only made for the
+rows a request actually returns.
+
+    python columnar.py data/prices.json data/prices.cph
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from datetime import datetime, timedelta
+
+from metrics import STORAGE_BYTES, STORAGE_LATENCY
+from rollups import MovingWindow, PriceBuckets
+from storage import FileLock, replace_file
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'CPH1'
+HEADER = struct.Struct('<4sIqq')
+
+# (name, typecode) per row and per sample; sample_offset has one value more than rows
+ROW_COLUMNS = [('id', 'q'), ('timestamp', 'q'), ('average_price', 'd'),
+               ('min_price', 'd'), ('max_price', 'd'), ('source_count', 'q'),
+               ('sample_offset', 'q')]
+SAMPLE_COLUMNS = [('sample_source', 'i'), ('sample_price', 'd'), ('sample_timestamp', 'q')]
+
+# Windows can't replace a file that is still mapped, read it instead
+USE_MMAP = os.name != 'nt'
+
+
+def to_micros(value):
+    """ISO timestamp string to integer epoch microseconds"""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return int(moment.replace(microsecond=0).timestamp()) * 1000000 + moment.microsecond
+
+
+def from_micros(micros):
+    """Integer epoch microseconds to a local ISO timestamp string"""
+    seconds, fraction = divmod(micros, 1000000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=fraction).isoformat()
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def _raw(column, lo, hi):
+    """Bytes of column[lo:hi] without copying"""
+    return memoryview(column)[lo:hi].cast('B')
+
+
+def _padding(size):
+    return -size % 8
+
+
+class ColumnarHistory:
+    """Read-only view of a .cph file (or of in-memory columns)"""
+
+    def __init__(self, columns, sources, meta=None, buffer=None):
+        self.columns = columns
+        self.sources = sources
+        self.meta = meta or {}
+        self._buffer = buffer
+
+    @classmethod
+    def empty(cls):
+        columns = {name: array(typecode) for name, typecode in ROW_COLUMNS + SAMPLE_COLUMNS}
+        columns['sample_offset'].append(0)
+        return cls(columns, [])
+
+    @classmethod
+    def open(cls, path):
+        with STORAGE_LATENCY.time(operation='load', file=os.path.basename(path)):
+            return cls._open(path)
+
+    @classmethod
+    def _open(cls, path):
+        with open(path, 'rb') as f:
+            if USE_MMAP:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+        view = memoryview(buffer)
+        magic, meta_size, rows, samples = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a columnar price history file")
+        offset = HEADER.size
+        meta = json.loads(bytes(view[offset:offset + meta_size]))
+        offset += meta_size + _padding(HEADER.size + meta_size)
+
+        columns = {}
+        swap = meta.get("byteorder", sys.byteorder) != sys.byteorder
+        for name, typecode in ROW_COLUMNS + SAMPLE_COLUMNS:
+            count = samples if (name, typecode) in SAMPLE_COLUMNS else rows
+            if name == 'sample_offset':
+                count += 1
+            size = count * array(typecode).itemsize
+            column = view[offset:offset + size].cast('B').cast(typecode)
+            if swap:
+                column = array(typecode, column.tobytes())
+                column.byteswap()
+            columns[name] = column
+            offset += size + _padding(size)
+        return cls(columns, meta.pop("sources", []), meta, buffer)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def column(self, name):
+        """A column as a numpy array when numpy is installed, else as a memoryview/array"""
+        column = self.columns[name]
+        if numpy is None:
+            return column
+        return numpy.frombuffer(column, dtype=getattr(column, 'typecode', None) or column.format)
+
+    def entry(self, row):
+        c = self.columns
+        samples = [
+            {
+                "source": self.sources[c['sample_source'][i]],
+                "price": _number(c['sample_price'][i]),
+                "timestamp": from_micros(c['sample_timestamp'][i])
+            }
+            for i in range(c['sample_offset'][row], c['sample_offset'][row + 1])
+        ]
+        return {
+            "id": c['id'][row],
+            "average_price": _number(c['average_price'][row]),
+            "min_price": _number(c['min_price'][row]),
+            "max_price": _number(c['max_price'][row]),
+            "source_count": c['source_count'][row],
+            "sources": samples,
+            "timestamp": from_micros(c['timestamp'][row])
+        }
+
+    def rows(self, start=None, end=None):
+        """Row range [lo, hi) with start <= epoch <= end"""
+        timestamps = self.columns['timestamp']
+        lo = 0 if start is None else bisect.bisect_left(timestamps, round(start * 1000000))
+        hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, round(end * 1000000))
+        return lo, hi
+
+
+class ColumnBuilder:
+    """Columns being assembled for a new .cph file"""
+
+    def __init__(self, sources=()):
+        self.columns = {name: array(typecode) for name, typecode in ROW_COLUMNS + SAMPLE_COLUMNS}
+        self.columns['sample_offset'].append(0)
+        self.sources = list(sources)
+        self._source_ids = {name: i for i, name in enumerate(self.sources)}
+
+    def _source_id(self, name):
+        source_id = self._source_ids.get(name)
+        if source_id is None:
+            source_id = self._source_ids[name] = len(self.sources)
+            self.sources.append(name)
+        return source_id
+
+    def copy_rows(self, history, lo, hi):
+        """Append rows [lo, hi) of a ColumnarHistory without making dicts"""
+        c = history.columns
+        first, last = c['sample_offset'][lo], c['sample_offset'][hi]
+        for name, _ in ROW_COLUMNS:
+            if name != 'sample_offset':
+                self.columns[name].frombytes(_raw(c[name], lo, hi))
+        base = self.columns['sample_offset'][-1] - first
+        self.columns['sample_offset'].extend(offset + base for offset in c['sample_offset'][lo + 1:hi + 1])
+        remap = [self._source_id(name) for name in history.sources]
+        if remap == list(range(len(remap))):
+            self.columns['sample_source'].frombytes(_raw(c['sample_source'], first, last))
+        else:
+            self.columns['sample_source'].extend(remap[i] for i in c['sample_source'][first:last])
+        self.columns['sample_price'].frombytes(_raw(c['sample_price'], first, last))
+        self.columns['sample_timestamp'].frombytes(_raw(c['sample_timestamp'], first, last))
+
+    def add(self, entry):
+        c = self.columns
+        c['id'].append(entry.get("id") or 0)
+        c['timestamp'].append(to_micros(entry["timestamp"]))
+        c['average_price'].append(float(entry["average_price"]))
+        c['min_price'].append(float(entry.get("min_price", entry["average_price"])))
+        c['max_price'].append(float(entry.get("max_price", entry["average_price"])))
+        samples = entry.get("sources") or []
+        c['source_count'].append(entry.get("source_count", len(samples)))
+        for sample in samples:
+            c['sample_source'].append(self._source_id(sample.get("source", '')))
+            c['sample_price'].append(float(sample["price"]))
+            c['sample_timestamp'].append(to_micros(sample.get("timestamp") or entry["timestamp"]))
+        c['sample_offset'].append(len(c['sample_price']))
+
+    def write(self, path, **meta):
+        """Write the columns to path atomically and durably, like save_json_file"""
+        meta = json.dumps({"sources": self.sources, "byteorder": sys.byteorder, **meta}).encode()
+        rows, samples = len(self.columns['id']), len(self.columns['sample_price'])
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                        prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with STORAGE_LATENCY.time(operation='save', file=os.path.basename(path)):
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(HEADER.pack(MAGIC, len(meta), rows, samples))
+                    f.write(meta + b'\0' * _padding(HEADER.size + len(meta)))
+                    for name, _ in ROW_COLUMNS + SAMPLE_COLUMNS:
+                        data = self.columns[name].tobytes()
+                        f.write(data + b'\0' * _padding(len(data)))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    size = f.tell()
+                replace_file(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        STORAGE_BYTES.inc(size, operation='save', file=os.path.basename(path))
+
+
+def write_entries(path, entries, **meta):
+    """Write price entries (dicts as in prices.json) to a .cph file"""
+    builder = ColumnBuilder()
+    for entry in sorted(entries, key=lambda entry: to_micros(entry["timestamp"])):
+        builder.add(entry)
+    builder.write(path, **meta)
+
+
+class ColumnarPriceStore:
+    """Price history kept in a .cph file, with the same interface as PriceStore.
+
+    Appending rewrites the file from the mapped columns of the previous
+    one; only the new entry is ever a dict. Writers in every process
+    share ``write_lock``.
+    """
+
+    def __init__(self, filepath, import_from=None):
+        self.filepath = filepath
+        self.lock = threading.RLock()
+        self.write_lock = FileLock(filepath + '.lock')
+        self._history = None
+        self._stamp = None
+        if import_from and not os.path.exists(filepath) and os.path.exists(import_from):
+            with self.write_lock:
+                if not os.path.exists(filepath):
+                    with open(import_from) as f:
+                        data = json.load(f)
+                    write_entries(filepath, data.get("prices", []), last_updated=data.get("last_updated"))
+
+    def _disk_stamp(self):
+        try:
+            st = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def version(self):
+        return self._disk_stamp()
+
+    def history(self):
+        """ColumnarHistory for the current file, remapped only after it changes"""
+        with self.lock:
+            stamp = self._disk_stamp()
+            if self._history is None or stamp != self._stamp:
+                self._history = ColumnarHistory.open(self.filepath) if stamp else ColumnarHistory.empty()
+                self._stamp = stamp
+                self._index(self._history)
+            return self._history
+
+    def _index(self, history):
+        """Chart buckets and the 7-day window, fed straight from the columns"""
+        self._buckets = PriceBuckets()
+        self._week = MovingWindow(7 * 24 * 3600)
+        self._last_id = max(history.columns['id'], default=0)
+        timestamps, averages = history.columns['timestamp'], history.columns['average_price']
+        week_start = bisect.bisect_right(timestamps, timestamps[-1] - self._week.seconds * 1000000) if len(history) else 0
+        for row in range(len(history)):
+            epoch = timestamps[row] / 1000000
+            self._buckets.add(epoch, averages[row])
+            if row >= week_start:
+                self._week.add(epoch, averages[row])
+
+    def latest(self):
+        history = self.history()
+        return history.entry(len(history) - 1) if len(history) else None
+
+    def between(self, start=None, end=None):
+        return list(self.iter_between(start, end))
+
+    def iter_between(self, start=None, end=None):
+        history = self.history()
+        lo, hi = history.rows(start, end)
+        for row in range(lo, hi):
+            yield history.entry(row)
+
+    def buckets(self, resolution, start=None, end=None):
+        with self.lock:
+            self.history()
+            return self._buckets.between(resolution, start, end)
+
+    def count(self):
+        return len(self.history())
+
+    def stats(self):
+        with self.lock:
+            history = self.history()
+            if not len(history):
+                return None
+            averages = history.columns['average_price']
+            change = 0
+            if len(history) >= 2:
+                change = round(((averages[-1] - averages[-2]) / averages[-2]) * 100, 1)
+            return {
+                "seven_day_average": self._week.average(),
+                "seven_day_min": _number(self._week.minimum()),
+                "seven_day_max": _number(self._week.maximum()),
+                "latest_change": change,
+                "data_points": len(history)
+            }
+
+    def append(self, entry, keep_days=30):
+        """Add a price entry and drop entries older than keep_days"""
+        with self.write_lock, self.lock:
+            history = self.history()
+            entry = {"id": self._last_id + 1, **entry}
+            cutoff = (datetime.now() - timedelta(days=keep_days)).timestamp()
+            lo, hi = history.rows(start=cutoff)
+            if lo < hi and history.columns['timestamp'][lo] == round(cutoff * 1000000):
+                lo += 1
+            builder = ColumnBuilder(history.sources)
+            builder.copy_rows(history, lo, hi)
+            builder.add(entry)
+            if len(history) and builder.columns['timestamp'][-1] < history.columns['timestamp'][-1]:
+                # Out of order entries are rare, sort them in the slow way
+                entries = [history.entry(row) for row in range(lo, hi)] + [entry]
+                builder = ColumnBuilder()
+                for item in sorted(entries, key=lambda item: to_micros(item["timestamp"])):
+                    builder.add(item)
+            # The old mapping stays valid for readers still holding it
+            builder.write(self.filepath, last_updated=datetime.now().isoformat())
+            self.history()
+            return entry
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data/prices.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + '.cph'
+    with open(source) as f:
+        data = json.load(f)
+    write_entries(target, data.get("prices", []), last_updated=data.get("last_updated"))
+    print(f"✅ {len(data.get('prices', []))} entries: {os.path.getsize(source)} bytes -> "
+          f"{os.path.getsize(target)} bytes in {target}")
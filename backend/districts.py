@@ -0,0 +1,226 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from storage import parse_timestamp
+
+TAMIL_NADU_DISTRICTS = [
+    "Ariyalur", "Chengalpattu", "Chennai", "Coimbatore", "Cuddalore", "Dharmapuri",
+    "Dindigul", "Erode", "Kallakurichi", "Kanchipuram", "Kanyakumari", "Karur",
+    "Krishnagiri", "Madurai", "Mayiladuthurai", "Nagapattinam", "Namakkal", "Nilgiris",
+    "Perambalur", "Pudukkottai", "Ramanathapuram", "Ranipet", "Salem", "Sivaganga",
+    "Tenkasi", "Thanjavur", "Theni", "Thoothukudi", "Tiruchirappalli", "Tirunelveli",
+    "Tirupathur", "Tiruppur", "Tiruvallur", "Tiruvannamalai", "Tiruvarur", "Vellore",
+    "Viluppuram", "Virudhunagar"
+]
+
+# Other spellings people submit, lower-cased
+DISTRICT_ALIASES = {
+    "trichy": "Tiruchirappalli",
+    "tiruchi": "Tiruchirappalli",
+    "tuticorin": "Thoothukudi",
+    "kancheepuram": "Kanchipuram",
+    "villupuram": "Viluppuram",
+    "the nilgiris": "Nilgiris",
+    "ooty": "Nilgiris",
+    "tirupattur": "Tirupathur",
+    "thiruvallur": "Tiruvallur",
+    "thiruvarur": "Tiruvarur",
+    "nagercoil": "Kanyakumari"
+}
+
+_CANONICAL = {name.lower(): name for name in TAMIL_NADU_DISTRICTS}
+
+
+def normalize_district(name):
+    """Canonical district name, or None if it isn't a Tamil Nadu district"""
+    key = (name or '').strip().lower()
+    return _CANONICAL.get(key) or DISTRICT_ALIASES.get(key)
+
+
+class DistrictStats:
+    """Approved prices of one district over a sliding time window.
+
+    Samples are kept sorted by time (for expiry and the trend split) and
+    prices sorted by value (for median/min/max). Sums for the whole window
+    and for its most recent part are kept alongside, so reading the
+    aggregate never scans the samples.
+    """
+
+    def __init__(self, recent_cutoff):
+        self.samples = []
+        self.prices = []
+        self.markets = Counter()
+        self.total = 0.0
+        # Samples from index recent_start on are newer than recent_cutoff
+        self.recent_cutoff = recent_cutoff
+        self.recent_start = 0
+        self.recent_total = 0.0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, epoch, price, market, record_id):
+        sample = (epoch, record_id, price, market)
+        bisect.insort(self.samples, sample)
+        bisect.insort(self.prices, price)
+        self.markets[market] += 1
+        self.total += price
+        if epoch > self.recent_cutoff:
+            self.recent_total += price
+        else:
+            self.recent_start += 1
+
+    def remove(self, epoch, price, market, record_id):
+        sample = (epoch, record_id, price, market)
+        position = bisect.bisect_left(self.samples, sample)
+        if position >= len(self.samples) or self.samples[position] != sample:
+            return
+        del self.samples[position]
+        del self.prices[bisect.bisect_left(self.prices, price)]
+        self._forget_market(market)
+        self.total -= price
+        if position >= self.recent_start:
+            self.recent_total -= price
+        else:
+            self.recent_start -= 1
+
+    def _forget_market(self, market):
+        self.markets[market] -= 1
+        if not self.markets[market]:
+            del self.markets[market]
+
+    def advance(self, window_cutoff, recent_cutoff):
+        """Drop samples at or before window_cutoff and move the recent boundary"""
+        expired = 0
+        while expired < len(self.samples) and self.samples[expired][0] <= window_cutoff:
+            _, _, price, market = self.samples[expired]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+            self._forget_market(market)
+            self.total -= price
+            if expired >= self.recent_start:
+                self.recent_total -= price
+            expired += 1
+        if expired:
+            del self.samples[:expired]
+            self.recent_start = max(self.recent_start - expired, 0)
+        self.recent_cutoff = recent_cutoff
+        while self.recent_start < len(self.samples) and self.samples[self.recent_start][0] <= recent_cutoff:
+            self.recent_total -= self.samples[self.recent_start][2]
+            self.recent_start += 1
+
+    def summary(self):
+        count = len(self.prices)
+        middle = count // 2
+        median = self.prices[middle] if count % 2 else (self.prices[middle - 1] + self.prices[middle]) / 2
+        recent_count = count - self.recent_start
+        older_count = self.recent_start
+        trend = 0
+        if recent_count and older_count:
+            older_mean = (self.total - self.recent_total) / older_count
+            trend = round(((self.recent_total / recent_count) - older_mean) / older_mean * 100, 1)
+        return {
+            "price": round(median, 1),
+            "min": round(self.prices[0], 1),
+            "max": round(self.prices[-1], 1),
+            "trend": f"{'+' if trend >= 0 else ''}{trend}%",
+            "source_count": count,
+            "markets": len(self.markets),
+            "last_submission": datetime.fromtimestamp(self.samples[-1][0]).isoformat()
+        }
+
+
+class DistrictView:
+    """Per-district aggregates of approved submissions, kept as a materialized view.
+
+    Subscribed to the submissions store: ``reset`` rebuilds it from every
+    record, ``change`` applies one added or edited submission.
+    """
+
+    def __init__(self, window_days=30, trend_days=7):
+        self.window = window_days * 24 * 3600
+        self.recent = trend_days * 24 * 3600
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._pending = Counter()
+
+    @staticmethod
+    def _sample(record):
+        """(district, epoch, price, market, id) of a record, None if it can't be placed"""
+        district = normalize_district(record.get("district"))
+        if district is None:
+            return None
+        try:
+            epoch = parse_timestamp(record["timestamp"])
+            price = float(record["user_price"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return district, epoch, price, record.get("market") or '', record.get("id") or 0
+
+    def reset(self, records):
+        with self._lock:
+            self._stats = {}
+            self._pending = Counter()
+            for record in records:
+                self._add(record)
+
+    def change(self, old, new):
+        with self._lock:
+            if old is not None:
+                self._remove(old)
+            self._add(new)
+
+    def _add(self, record):
+        sample = self._sample(record)
+        if sample is None:
+            return
+        district, epoch, price, market, record_id = sample
+        if record.get("status") == 'pending':
+            self._pending[district] += 1
+        elif record.get("status") == 'approved' and epoch > time.time() - self.window:
+            stats = self._stats.get(district)
+            if stats is None:
+                stats = self._stats[district] = DistrictStats(time.time() - self.recent)
+            stats.add(epoch, price, market, record_id)
+
+    def _remove(self, record):
+        sample = self._sample(record)
+        if sample is None:
+            return
+        district, epoch, price, market, record_id = sample
+        if record.get("status") == 'pending':
+            self._pending[district] -= 1
+        elif record.get("status") == 'approved' and district in self._stats:
+            self._stats[district].remove(epoch, price, market, record_id)
+
+    def districts(self, state_average=None):
+        """One row per district; districts without approved prices fall back to state_average"""
+        now = time.time()
+        rows = []
+        with self._lock:
+            for district in TAMIL_NADU_DISTRICTS:
+                stats = self._stats.get(district)
+                if stats is not None:
+                    stats.advance(now - self.window, now - self.recent)
+                if stats:
+                    row = stats.summary()
+                    row["source"] = "submissions"
+                elif state_average is not None:
+                    row = {
+                        "price": state_average,
+                        "min": state_average,
+                        "max": state_average,
+                        "trend": "+0%",
+                        "source_count": 0,
+                        "markets": 0,
+                        "last_submission": None,
+                        "source": "state_average"
+                    }
+                else:
+                    continue
+                row["district"] = district
+                row["pending"] = self._pending[district]
+                rows.append(row)
+        return rows
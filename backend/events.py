@@ -0,0 +1,163 @@
+"""Server-Sent Events fan-out for live price and stats updates.
+
+One Broadcaster is shared by every subscriber. A published event is
+reduced to the fields that changed since the last event of its kind,
+encoded once and appended to a short numbered backlog; subscribers are
+generators blocked on a single Condition, so an idle one costs a
+waiting thread (a greenlet under gevent) and nothing per event until it
+wakes. A client that reconnects with Last-Event-ID gets the events it
+missed from the backlog, or a full snapshot if it fell too far behind.
+
+Under a threaded server every open stream holds one request thread, so
+``max_subscribers`` caps how many a process accepts; ``close`` ends them
+all when the process shuts down.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+# Reconnect delay sent to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+
+def format_event(event_id, event, data):
+    payload = json.dumps(data, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class Broadcaster:
+    """Shared event stream; ``publish`` from write paths, ``stream`` per subscriber"""
+
+    def __init__(self, backlog=256, heartbeat=15, max_subscribers=0):
+        self.heartbeat = heartbeat
+        # 0 = no limit
+        self.max_subscribers = max_subscribers
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=backlog)
+        self._id = 0
+        self._state = {}
+        self._subscribers = 0
+        self._closed = False
+        self._watcher = None
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def close(self):
+        """End every open stream and refuse new ones"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def publish(self, event, data):
+        """Push the fields of ``data`` that changed since the last ``event``; returns them (or None)"""
+        with self._cond:
+            previous = self._state.get(event, {})
+            delta = {key: value for key, value in data.items() if previous.get(key) != value}
+            if not delta:
+                return None
+            self._state[event] = dict(data)
+            self._id += 1
+            self._events.append((self._id, format_event(self._id, event, delta)))
+            self._cond.notify_all()
+            return delta
+
+    def _snapshot(self):
+        """Full current state as events numbered with the latest id (lock held)"""
+        return b''.join(format_event(self._id, event, data) for event, data in self._state.items())
+
+    def _since(self, last_id):
+        """Encoded events after ``last_id``, or a snapshot if some already left the backlog (lock held)"""
+        if last_id >= self._id:
+            return b''
+        if not self._events or self._events[0][0] > last_id + 1:
+            return self._snapshot()
+        return b''.join(message for event_id, message in self._events if event_id > last_id)
+
+    def stream(self, last_event_id=None):
+        """Iterable of SSE bytes for one subscriber, or None if ``max_subscribers`` are open.
+
+        It runs until the client goes away or ``close`` is called, and
+        gives its place back when the server closes it.
+        """
+        try:
+            last_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_id = None
+        with self._cond:
+            if self._closed or (self.max_subscribers and self._subscribers >= self.max_subscribers):
+                return None
+            self._subscribers += 1
+            if last_id is None or last_id > self._id:
+                # New client (or one from before a restart): start from the full state
+                first = self._snapshot()
+            else:
+                first = self._since(last_id)
+            last_id = self._id
+        return Subscription(self, self._messages(first, last_id))
+
+    def _messages(self, first, last_id):
+        yield f"retry: {RETRY_MS}\n\n".encode() + first
+        while True:
+            with self._cond:
+                if last_id == self._id and not self._closed:
+                    self._cond.wait(self.heartbeat)
+                if self._closed:
+                    # The client reconnects (to another process) with Last-Event-ID
+                    return
+                chunk = self._since(last_id)
+                last_id = self._id
+            # A comment line keeps proxies from timing out idle connections
+            # and lets the server notice clients that have gone away
+            yield chunk or b': keepalive\n\n'
+
+    def _release(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def watch(self, version, refresh, interval=2.0):
+        """Call ``refresh`` when ``version()`` changes while anyone is subscribed.
+
+        Picks up writes made by other worker processes, which never call
+        ``publish`` here.
+        """
+        if self._watcher is not None:
+            return
+        def loop():
+            seen = version()
+            while True:
+                time.sleep(interval)
+                if not self._subscribers:
+                    continue
+                try:
+                    current = version()
+                    if current != seen:
+                        seen = current
+                        refresh()
+                except Exception as e:
+                    print(f"❌ Event watcher failed: {e}")
+        self._watcher = threading.Thread(target=loop, name='event-watcher', daemon=True)
+        self._watcher.start()
+
+
+class Subscription:
+    """One subscriber's stream; the WSGI server's ``close`` frees its place even if never iterated"""
+
+    def __init__(self, broadcaster, messages):
+        self._broadcaster = broadcaster
+        self._messages = messages
+        self._open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._messages)
+
+    def close(self):
+        if self._open:
+            self._open = False
+            self._messages.close()
+            self._broadcaster._release()
@@ -0,0 +1,235 @@
+"""Per-source price extractors for scraped pages.
+
+An extractor turns a page into rows of
+``{"market", "min", "max", "modal"}``. TableExtractor reads only the
+price table: it cuts the table out of the page by its header text and
+feeds just that slice to a streaming parser (lxml's target parser when
+installed, else html.parser), so no document tree is built. Sources
+without a registered extractor fall back to RegexExtractor, the old
+"first few ₹ amounts on the page" behaviour.
+"""
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def parse_amount(text):
+    """'₹ 2,850.50' -> 2850.5; None if there's no number"""
+    match = _NUMBER.search(text.replace(',', ''))
+    if not match:
+        return None
+    value = float(match.group())
+    return int(value) if value.is_integer() else value
+
+
+class _TableFound(Exception):
+    """Stops the parser once the price table has been read"""
+
+
+class _TableCollector:
+    """Parser target collecting the cell texts of the first matching table.
+
+    Works with html.parser (through _StreamParser) and as an lxml parser
+    target. Missing </td> and </tr> are closed implicitly.
+    """
+
+    def __init__(self, is_header):
+        self.is_header = is_header
+        self.depth = 0
+        self.skipping = False
+        self.rows = []
+        self.row = None
+        self.cell = None
+        self.found = False
+
+    def start(self, tag, attrs=None):
+        tag = tag.lower()
+        if tag == 'table':
+            self.depth += 1
+            if self.depth == 1:
+                self.rows, self.skipping = [], False
+        elif self.depth != 1 or self.skipping:
+            return
+        elif tag == 'tr':
+            self._close_row()
+            self.row = []
+        elif tag in ('td', 'th') and self.row is not None:
+            self._close_cell()
+            self.cell = []
+
+    def data(self, text):
+        if self.cell is not None:
+            self.cell.append(text)
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag == 'table':
+            if self.depth == 1 and not self.skipping:
+                self._close_row()
+                if self.rows:
+                    self.found = True
+                    raise _TableFound()
+            self.depth = max(self.depth - 1, 0)
+        elif self.depth != 1 or self.skipping:
+            return
+        elif tag in ('td', 'th'):
+            self._close_cell()
+        elif tag == 'tr':
+            self._close_row()
+
+    def _close_cell(self):
+        if self.cell is not None and self.row is not None:
+            self.row.append(' '.join(''.join(self.cell).split()))
+        self.cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self.row:
+            if not self.rows and not self.is_header(self.row):
+                # Not the price table, ignore it up to its </table>
+                self.skipping = True
+            else:
+                self.rows.append(self.row)
+        self.row = None
+
+    def close(self):
+        return self.rows if self.found else []
+
+
+class _StreamParser(HTMLParser):
+    """html.parser events forwarded to a _TableCollector"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+class RegexExtractor:
+    """The first ``limit`` rupee amounts anywhere on the page"""
+
+    def __init__(self, limit=3):
+        self.limit = limit
+
+    def extract(self, html):
+        prices = [int(p) for p in re.findall(r'₹\s*(\d+)', html)[:self.limit]]
+        return [{"market": None, "min": p, "max": p, "modal": p} for p in prices]
+
+
+class TableExtractor:
+    """Rows of the first table whose header names all the wanted columns.
+
+    ``columns`` maps market/min/max/modal to lower-case keywords looked
+    for in the header cells. ``anchor`` is header text used to cut the
+    table out of the page before parsing; without it, or if it isn't
+    found, the whole page is streamed through the parser. Amounts are
+    multiplied by ``scale`` (0.01 turns ₹/quintal into ₹/kg).
+    """
+
+    DEFAULT_COLUMNS = {
+        "market": ('market',),
+        "min": ('min',),
+        "max": ('max',),
+        "modal": ('modal', 'avg', 'average')
+    }
+
+    def __init__(self, anchor=None, columns=None, scale=1, row_filter=None, use_lxml=True):
+        self.anchor = anchor
+        self.columns = columns or self.DEFAULT_COLUMNS
+        self.scale = scale
+        self.row_filter = row_filter
+        self.use_lxml = use_lxml and etree is not None
+
+    def _positions(self, header):
+        """Column index per field, or None if a field is missing"""
+        cells = [cell.lower() for cell in header]
+        positions = {}
+        for field, keywords in self.columns.items():
+            for i, cell in enumerate(cells):
+                if any(keyword in cell for keyword in keywords) and i not in positions.values():
+                    positions[field] = i
+                    break
+            else:
+                return None
+        return positions
+
+    def _slice(self, html):
+        """The <table>...</table> around the anchor text, or the whole page"""
+        if self.anchor:
+            at = html.find(self.anchor)
+            if at != -1:
+                start = html.rfind('<table', 0, at)
+                end = html.find('</table>', at)
+                if start != -1 and end != -1:
+                    return html[start:end + len('</table>')]
+        return html
+
+    def table(self, html):
+        """Cell texts of the price table, header row first ([] if not found)"""
+        collector = _TableCollector(lambda row: self._positions(row) is not None)
+        if self.use_lxml:
+            parser = etree.HTMLParser(target=collector)
+            try:
+                parser.feed(html)
+                return parser.close()
+            except _TableFound:
+                return collector.rows
+        parser = _StreamParser(collector)
+        try:
+            parser.feed(html)
+            parser.close()
+        except _TableFound:
+            pass
+        return collector.close()
+
+    def extract(self, html):
+        table = self.table(self._slice(html))
+        if not table and self.anchor:
+            table = self.table(html)
+        if not table:
+            return []
+        positions = self._positions(table[0])
+        rows = []
+        for cells in table[1:]:
+            if len(cells) <= max(positions.values()):
+                continue
+            row = {"market": cells[positions["market"]]}
+            for field in ("min", "max", "modal"):
+                amount = parse_amount(cells[positions[field]])
+                row[field] = None if amount is None else round(amount * self.scale, 2)
+            if row["modal"] is None:
+                continue
+            if self.row_filter is None or self.row_filter(cells):
+                rows.append(row)
+        return rows
+
+
+# Extractor per source name; others use DEFAULT_EXTRACTOR
+EXTRACTORS = {
+    # Mandi table in ₹/quintal
+    "commodityonline": TableExtractor(anchor='Modal Price', scale=0.01),
+}
+
+DEFAULT_EXTRACTOR = RegexExtractor()
+
+
+def register_extractor(source, extractor):
+    EXTRACTORS[source] = extractor
+
+
+def get_extractor(source):
+    return EXTRACTORS.get(source, DEFAULT_EXTRACTOR)
@@ -0,0 +1,159 @@
+"""Write-behind queue that group-commits submissions.
+
+Request handlers call ``GroupCommitQueue.add`` (or ``add_many`` for a
+batch): the submission gets its id straight away, from a block taken
+with ``store.reserve_ids``, and goes on a queue. One writer thread
+drains the queue, waiting up to ``max_delay`` seconds for more to
+arrive unless ``max_batch`` are already waiting, and stores each batch
+with a single fsynced ``add_many``. A burst of submissions costs a few
+journal appends instead of one per request. Ids handed out by one queue
+increase in the order submissions are queued; a batch is never split
+between writes.
+
+Durability modes:
+
+- ``fsync``: ``add`` returns once the batch holding the submission is on disk
+- ``enqueue``: ``add`` returns as soon as the submission is queued; a
+  crash loses up to ``max_delay`` seconds of submissions
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import REGISTRY
+
+DURABILITY_MODES = ('fsync', 'enqueue')
+
+BATCH_SIZES = REGISTRY.histogram(
+    'coconut_group_commit_batch_size', 'Submissions stored per group-commit write',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+
+class GroupCommitQueue:
+    def __init__(self, store, durability='fsync', max_batch=500, max_delay=0.005, id_block=64,
+                 on_commit=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of: {', '.join(DURABILITY_MODES)}")
+        self.store = store
+        self.durability = durability
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        # Ids are reserved this many at a time; unused ones are skipped at exit
+        self.id_block = id_block
+        # Called from the writer thread after each stored batch
+        self.on_commit = on_commit
+        self._closed = False
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Empty queue, no writer thread and no ids; also run in forked children,
+        which must not share the parent's id block"""
+        self._next_id = 0
+        self._id_end = 0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._writing = None
+        self._thread = None
+
+    def add(self, submission):
+        """Queue a submission; returns it with its id (after the fsync in 'fsync' mode)"""
+        return self.add_many([submission])[0]
+
+    def add_many(self, submissions):
+        """Queue submissions to be stored in the same write; returns them with their ids"""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write queue is closed")
+            # Ids taken under the queue's lock follow the queue order
+            first = self._reserve_ids(len(submissions))
+            records = [{"id": first + i, **submission} for i, submission in enumerate(submissions)]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+            self._queue.append((records, future))
+            self._cond.notify_all()
+        if self.durability == 'fsync':
+            return future.result()
+        return records
+
+    def _reserve_ids(self, count):
+        """First of ``count`` consecutive ids from the reserved block (queue lock held)"""
+        if self._next_id + count > self._id_end:
+            # The rest of the current block is skipped
+            self._next_id = self.store.reserve_ids(count + self.id_block)
+            self._id_end = self._next_id + count + self.id_block
+        self._next_id += count
+        return self._next_id - count
+
+    def pending(self):
+        """Submissions queued or being written"""
+        with self._cond:
+            return sum(len(records) for records, _ in self._queue + (self._writing or []))
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_delay
+            while sum(len(records) for records, _ in self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # Whole requests only, at least one however large
+            batch, size = [], 0
+            while self._queue and (not batch or size + len(self._queue[0][0]) <= self.max_batch):
+                batch.append(self._queue.pop(0))
+                size += len(batch[-1][0])
+            self._writing = batch
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            records = [record for requested, _ in batch for record in requested]
+            try:
+                self.store.add_many(records, sync=True)
+            except Exception as e:
+                print(f"❌ Group commit of {len(records)} submissions failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                BATCH_SIZES.observe(len(records))
+                for requested, future in batch:
+                    future.set_result(requested)
+                if self.on_commit:
+                    try:
+                        self.on_commit()
+                    except Exception as e:
+                        print(f"❌ After-commit hook failed: {e}")
+            finally:
+                with self._cond:
+                    self._writing = None
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is stored; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=10):
+        """Store what is queued and stop the writer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush(timeout)
+        if self._thread is not None:
+            self._thread.join(timeout)
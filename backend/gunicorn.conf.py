@@ -0,0 +1,77 @@
+"""gunicorn settings for wsgi.py: one preloaded master, forked threaded workers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each /api/events subscriber holds a request thread of a gthread worker
+for as long as it stays connected, so a worker accepts at most half its
+threads' worth of streams and answers the rest with 503 (the React app
+then polls). For many live subscribers, serve /api/events from a second
+server with gevent workers (``pip install gevent``), where a stream is
+a greenlet, and have the reverse proxy route that path there:
+
+    COCONUT_WORKER_CLASS=gevent COCONUT_BIND=127.0.0.1:5001 gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import signal
+import time
+
+bind = os.environ.get('COCONUT_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('COCONUT_WORKERS', os.cpu_count() or 2))
+# 'gthread', or 'gevent' for a server that mostly holds event streams
+worker_class = os.environ.get('COCONUT_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('COCONUT_THREADS', 16))
+if worker_class == 'gevent':
+    # Patch before the preloaded app creates its locks and threads
+    from gevent import monkey
+    monkey.patch_all()
+    worker_connections = int(os.environ.get('COCONUT_WORKER_CONNECTIONS', 10000))
+else:
+    # Keep at least half of every worker's threads for the API
+    os.environ.setdefault('COCONUT_MAX_EVENT_STREAMS', str(max(threads // 2, 1)))
+# Import the app and load the data once in the master, shared copy-on-write
+preload_app = True
+# Event streams stay open; only time out workers that stop responding
+timeout = 60
+keepalive = 5
+
+
+def when_ready(server):
+    import wsgi
+    server.log.info(f"App imported in {wsgi.IMPORT_SECONDS * 1000:.0f} ms, "
+                    f"data preloaded in {wsgi.PRELOAD_SECONDS * 1000:.0f} ms")
+
+
+def pre_fork(server, worker):
+    worker.fork_started = time.perf_counter()
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.start_worker()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} ready "
+                    f"{(time.perf_counter() - worker.fork_started) * 1000:.1f} ms after fork")
+    # On SIGTERM, end the event streams first: the graceful shutdown waits
+    # for open requests, and a stream would never finish by itself
+    handle_exit = signal.getsignal(signal.SIGTERM)
+
+    def stop(sig, frame):
+        import wsgi
+        if worker_class == 'gevent':
+            # Signal handlers run in gevent's hub, which mustn't block
+            import gevent
+            gevent.spawn(wsgi.stop_worker)
+        else:
+            # The main thread of a gthread worker only polls sockets, it
+            # never holds the broadcaster's lock
+            wsgi.stop_worker()
+        handle_exit(sig, frame)
+    signal.signal(signal.SIGTERM, stop)
+
+
+def worker_int(worker):
+    # SIGINT/SIGQUIT: the process exits once its request threads have returned
+    import wsgi
+    wsgi.stop_worker()
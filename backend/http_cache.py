@@ -0,0 +1,233 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import REGISTRY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CACHE_RESULTS = REGISTRY.counter(
+    'coconut_response_cache_total', 'Read requests answered from the response cache (hit) or not (miss)',
+    ('endpoint', 'result'))
+
+
+class DataVersion:
+    """Version of the stored data, derived from the stores' own version tokens.
+
+    The token changes on every write, including writes made by other
+    processes, and depends on nothing else, so every worker gives the
+    same ETag for the same data.
+    """
+
+    def __init__(self, *stores):
+        self.stores = stores
+        self._lock = threading.Lock()
+        self._token = None
+        self._modified = time.time()
+
+    def current(self):
+        """(etag value, last modified epoch) for the current data"""
+        versions = repr(tuple(store.version() for store in self.stores))
+        token = hashlib.sha1(versions.encode()).hexdigest()[:16]
+        with self._lock:
+            if token != self._token:
+                self._token = token
+                self._modified = time.time()
+            return self._token, self._modified
+
+
+class ResponseCache:
+    """Encoded response bodies per (endpoint, query string, encoding), LRU-evicted.
+
+    An entry is only served while the ETag it was built for is current,
+    and for at most ``ttl`` seconds.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, max_entry_bytes=1024 * 1024, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key, version):
+        """(body, headers) for ``key`` if built for ``version`` and fresh enough, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, stored_at, body, headers = entry
+            if entry_version != version or time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body, headers
+
+    def put(self, key, version, body, headers):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, time.monotonic(), body, headers)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._bytes -= len(self._entries.pop(key)[2])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+                return orjson.dumps(obj, option=option | orjson.OPT_NON_STR_KEYS).decode()
+            except TypeError:
+                # Types only the default encoder knows (dates, decimals...)
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            # Indented output for debugging stays with the default encoder
+            return super().response(*args, **kwargs)
+        return self._app.response_class(self.dumps(obj) + '\n', mimetype=self.mimetype)
+
+
+class ConditionalGet:
+    """ETag/Last-Modified revalidation, response caching and compression for read endpoints.
+
+    For the endpoints listed, a request whose If-None-Match or
+    If-Modified-Since still matches the data version (and the state
+    below) gets a 304 before the view runs, and with a ``cache`` a repeat
+    of a request whose body was built for the current ETag is answered
+    with the stored bytes. Any response larger than ``min_size`` is gzip
+    (or brotli, if installed) compressed when the client accepts it.
+
+    ``state`` maps endpoints to a function returning whatever else their
+    response depends on (the clock, a running refresh), or None; it is
+    mixed into the ETag, so it also keys the cached bodies.
+    """
+
+    def __init__(self, app, data_version, endpoints, min_size=1024, max_age=0, cache=None, state=None):
+        self.data_version = data_version
+        self.endpoints = set(endpoints)
+        self.min_size = min_size
+        self.max_age = max_age
+        self.cache = cache
+        self.state = state or {}
+        self._lock = threading.Lock()
+        self._seen = {}
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def _validators(self):
+        """(etag, last modified epoch) for the data and the endpoint's state"""
+        etag, modified = self.data_version.current()
+        state = self.state.get(request.endpoint)
+        state = state() if state else None
+        if state is None:
+            return etag, modified
+        etag = hashlib.sha1(f"{etag}:{state!r}".encode()).hexdigest()[:16]
+        with self._lock:
+            # Last-Modified moves on whenever the state does, like the data's
+            seen = self._seen.get(request.endpoint)
+            if seen is None or seen[0] != etag:
+                seen = self._seen[request.endpoint] = (etag, max(time.time(), modified))
+            return seen
+
+    def before_request(self):
+        if request.method != 'GET' or request.endpoint not in self.endpoints:
+            return None
+        etag, modified = self._validators()
+        g.data_etag, g.data_modified = etag, modified
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and int(modified) <= since.timestamp()
+        if not_modified:
+            response = current_app.response_class(status=304)
+            self._set_validators(response)
+            return response
+
+        if self.cache is not None:
+            key = (request.endpoint, request.query_string, self._encoding()[0])
+            cached = self.cache.get(key, etag)
+            if cached is not None:
+                CACHE_RESULTS.inc(endpoint=request.endpoint, result='hit')
+                g.response_cached = True
+                body, headers = cached
+                return current_app.response_class(body, headers=headers)
+            CACHE_RESULTS.inc(endpoint=request.endpoint, result='miss')
+            g.response_cache_key = key
+        return None
+
+    def _set_validators(self, response):
+        response.set_etag(g.data_etag, weak=True)
+        response.last_modified = int(g.data_modified)
+        response.cache_control.max_age = self.max_age
+        response.cache_control.must_revalidate = True
+
+    def after_request(self, response):
+        if 'data_etag' in g and response.status_code == 200:
+            self._set_validators(response)
+        if g.get('response_cached'):
+            return response
+        response = self._compress(response)
+        if 'response_cache_key' in g and response.status_code == 200 and not response.is_streamed:
+            headers = [(name, value) for name, value in response.headers.items()
+                       if name in ('Content-Type', 'Content-Encoding', 'Vary')]
+            self.cache.put(g.response_cache_key, g.data_etag, response.get_data(), headers)
+        return response
+
+    @staticmethod
+    def _encoding():
+        """(Content-Encoding, compress function) the client accepts, or (None, None)"""
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br', brotli.compress
+        if accepted['gzip']:
+            return 'gzip', lambda body: gzip.compress(body, compresslevel=6)
+        return None, None
+
+    def _compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding, compress = self._encoding()
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.set_data(compress(body))
+        response.headers['Content-Encoding'] = encoding
+        return response
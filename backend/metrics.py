@@ -0,0 +1,155 @@
+"""In-process metrics, exposed in the Prometheus text format.
+
+Counters and histograms live in the module-level ``REGISTRY``; every
+worker process keeps its own, so with several workers each one is a
+separate scrape target (or the numbers are per worker).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+# Seconds; covers a cached GET up to a slow scrape
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (made cumulative on render), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'coconut_http_requests_total', 'HTTP requests by endpoint, method and status code',
+    ('endpoint', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'coconut_http_request_duration_seconds', 'Time to build the response, by endpoint',
+    ('endpoint', 'method'))
+STORAGE_LATENCY = REGISTRY.histogram(
+    'coconut_storage_duration_seconds', 'Time spent reading and writing data files',
+    ('operation', 'file'))
+STORAGE_BYTES = REGISTRY.counter(
+    'coconut_storage_bytes_total', 'Bytes read from and written to data files',
+    ('operation', 'file'))
+SCRAPE_LATENCY = REGISTRY.histogram(
+    'coconut_scrape_duration_seconds', 'Time to fetch and to parse each price source',
+    ('source', 'phase'))
+SCRAPE_BYTES = REGISTRY.counter(
+    'coconut_scrape_bytes_total', 'Bytes downloaded per price source', ('source',))
+SCRAPE_ERRORS = REGISTRY.counter(
+    'coconut_scrape_errors_total', 'Failed fetches per price source', ('source',))
+
+
+class RequestMetrics:
+    """Counts and times every request by endpoint.
+
+    Register it before other before_request hooks that may answer early
+    (ConditionalGet's 304s), so those requests are timed too.
+    """
+
+    def __init__(self, app):
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def before_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def after_request(self, response):
+        if 'metrics_start' in g:
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_LATENCY.observe(time.perf_counter() - g.metrics_start,
+                                 endpoint=endpoint, method=request.method)
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        return response
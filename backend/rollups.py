@@ -0,0 +1,161 @@
+import bisect
+from collections import deque
+from datetime import datetime, timedelta
+
+RESOLUTIONS = ('hour', 'day', 'week')
+
+# Chart label per resolution
+LABEL_FORMATS = {
+    'hour': '%b %d %H:00',
+    'day': '%b %d',
+    'week': '%b %d'
+}
+
+
+def bucket_start(epoch, resolution):
+    """Start of the local hour, day or week (Monday) containing epoch"""
+    moment = datetime.fromtimestamp(epoch)
+    if resolution == 'hour':
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if resolution == 'week':
+            moment -= timedelta(days=moment.weekday())
+    return moment
+
+
+class Bucket:
+    """Open/high/low/close/average of the prices that fell in one interval"""
+
+    __slots__ = ('start', 'label', 'open', 'high', 'low', 'close',
+                 'total', 'count', 'open_epoch', 'close_epoch')
+
+    def __init__(self, start, label, epoch, price):
+        self.start = start
+        self.label = label
+        self.open = self.high = self.low = self.close = price
+        self.total = price
+        self.count = 1
+        self.open_epoch = self.close_epoch = epoch
+
+    def add(self, epoch, price):
+        if epoch < self.open_epoch:
+            self.open, self.open_epoch = price, epoch
+        if epoch >= self.close_epoch:
+            self.close, self.close_epoch = price, epoch
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.total += price
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            "start": self.start,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "average": round(self.total / self.count, 2),
+            "count": self.count
+        }
+
+    def chart_point(self):
+        return {
+            "date": self.label,
+            "price": round(self.total / self.count, 2),
+            "min": self.low,
+            "max": self.high,
+            "open": self.open,
+            "close": self.close
+        }
+
+
+class PriceBuckets:
+    """OHLC buckets of average_price for every resolution, updated per entry.
+
+    Buckets are only dropped once they end before the retention cutoff, so
+    the oldest bucket may still count a few expired entries.
+    """
+
+    def __init__(self):
+        self._starts = {resolution: [] for resolution in RESOLUTIONS}
+        self._buckets = {resolution: {} for resolution in RESOLUTIONS}
+
+    def add(self, epoch, price):
+        for resolution in RESOLUTIONS:
+            buckets = self._buckets[resolution]
+            moment = bucket_start(epoch, resolution)
+            key = moment.timestamp()
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = Bucket(moment.isoformat(), moment.strftime(LABEL_FORMATS[resolution]), epoch, price)
+                bisect.insort(self._starts[resolution], key)
+            else:
+                bucket.add(epoch, price)
+
+    def expire(self, cutoff):
+        """Drop buckets that end at or before the cutoff epoch"""
+        for resolution in RESOLUTIONS:
+            starts = self._starts[resolution]
+            buckets = self._buckets[resolution]
+            # Keep the bucket holding the cutoff, it still has live entries
+            keep_from = bisect.bisect_left(starts, bucket_start(cutoff, resolution).timestamp())
+            if keep_from:
+                for key in starts[:keep_from]:
+                    del buckets[key]
+                del starts[:keep_from]
+
+    def between(self, resolution, start=None, end=None):
+        """Buckets of a resolution overlapping [start, end], oldest first"""
+        starts = self._starts[resolution]
+        lo = 0 if start is None else bisect.bisect_left(starts, bucket_start(start, resolution).timestamp())
+        hi = len(starts) if end is None else bisect.bisect_right(starts, end)
+        buckets = self._buckets[resolution]
+        return [buckets[key] for key in starts[lo:hi]]
+
+
+class MovingWindow:
+    """Sum, min and max of the values seen in the last ``seconds``.
+
+    Values must arrive in time order. min and max come from monotonic
+    deques, so every update is amortised O(1).
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._values = deque()
+        self._mins = deque()
+        self._maxes = deque()
+        self._total = 0.0
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, epoch, value):
+        self._values.append((epoch, value))
+        self._total += value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((epoch, value))
+        while self._maxes and self._maxes[-1][1] <= value:
+            self._maxes.pop()
+        self._maxes.append((epoch, value))
+        self.expire(epoch - self.seconds)
+
+    def expire(self, cutoff):
+        """Forget values at or before the cutoff epoch"""
+        while self._values and self._values[0][0] <= cutoff:
+            self._total -= self._values.popleft()[1]
+        while self._mins and self._mins[0][0] <= cutoff:
+            self._mins.popleft()
+        while self._maxes and self._maxes[0][0] <= cutoff:
+            self._maxes.popleft()
+
+    def average(self):
+        return round(self._total / len(self._values), 2) if self._values else None
+
+    def minimum(self):
+        return self._mins[0][1] if self._mins else None
+
+    def maximum(self):
+        return self._maxes[0][1] if self._maxes else None
@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class RefreshScheduler:
+    """Runs a refresh job in the background, one at a time.
+
+    ``trigger`` starts the job unless it is already running, in which case
+    callers share the in-flight run (single-flight). ``start`` also runs
+    it every ``interval`` seconds.
+
+    With several worker processes, ``leader`` (a FileLock) picks the one
+    that runs the schedule: each worker's scheduler tries it without
+    waiting once per interval and the one that gets it keeps it until it
+    exits. ``last_refresh`` returns the epoch time of the newest stored
+    result, from whichever process made it; scheduled runs wait until
+    that is ``interval`` seconds old.
+    """
+
+    def __init__(self, job, interval=0, leader=None, last_refresh=None):
+        self.job = job
+        self.interval = interval
+        self.leader = leader
+        self.last_refresh = last_refresh
+        self.last_run = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._future = None
+        self._thread = None
+        self._leading = leader is None
+        self._stop = threading.Event()
+
+    def in_flight(self):
+        future = self._future
+        return future is not None and not future.done()
+
+    def trigger(self):
+        """Return a Future for the current run, starting one if none is running"""
+        with self._lock:
+            if self.in_flight():
+                return self._future
+            future = Future()
+            self._future = future
+        threading.Thread(target=self._run, args=(future,), name='price-refresh', daemon=True).start()
+        return future
+
+    def _run(self, future):
+        future.set_running_or_notify_cancel()
+        try:
+            result = self.job()
+        except Exception as e:
+            self.last_error = str(e)
+            future.set_exception(e)
+        else:
+            self.last_error = None
+            future.set_result(result)
+        finally:
+            self.last_run = time.time()
+
+    def start(self):
+        """Refresh every ``interval`` seconds in a background thread"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        def loop():
+            delay = self.interval
+            while not self._stop.wait(delay):
+                delay = self.interval
+                try:
+                    if not self._leading:
+                        self._leading = self.leader.acquire(blocking=False)
+                        if not self._leading:
+                            continue
+                    last = self.last_refresh() if self.last_refresh else None
+                    if last is not None and time.time() - last < self.interval:
+                        # Refreshed since (manually, or by the previous leader)
+                        delay = self.interval - (time.time() - last)
+                        continue
+                    self.trigger().result()
+                except Exception as e:
+                    print(f"❌ Scheduled refresh failed: {e}")
+        self._thread = threading.Thread(target=loop, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,200 @@
+"""On-disk HTTP cache, per-host rate limiting and retries for the scraper.
+
+A page fetched within ``ttl`` seconds is served from disk without a
+request. After that it is revalidated with If-None-Match/If-Modified-Since,
+so an unchanged page costs a 304 instead of a download. Requests to one
+host are spaced at least ``min_interval`` apart, and 429/5xx answers and
+connection errors (not timeouts) are retried with exponential backoff;
+when every try fails a stale copy is served if there is one.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import REGISTRY
+
+CACHE_RESULTS = REGISTRY.counter(
+    'coconut_scrape_cache_total', 'Scraper fetches by cache outcome (fresh, revalidated, miss, stale)',
+    ('source', 'result'))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CachedPage:
+    """Body of a fetched page and where it came from"""
+
+    def __init__(self, url, content, encoding, headers, fetched_at, result):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers
+        self.fetched_at = fetched_at
+        self.result = result
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    @property
+    def version(self):
+        """Changes only when the body is downloaded again"""
+        return self.headers.get('ETag') or self.headers.get('Last-Modified') or self.fetched_at
+
+
+class ResponseCache:
+    """Response bodies and validators on disk, one pair of files per URL"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                content = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return CachedPage(url, content, meta.get("encoding"), meta.get("headers", {}),
+                          meta.get("stored_at", 0), 'fresh')
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, url, content, encoding, headers, stored_at=None):
+        meta_path, body_path = self._paths(url)
+        validators = {name: headers[name] for name in ('ETag', 'Last-Modified') if name in headers}
+        meta = {"url": url, "encoding": encoding, "headers": validators, "stored_at": stored_at or time.time()}
+        # Body first: a reader never finds new validators next to an old body
+        self._write(body_path, content)
+        self._write(meta_path, json.dumps(meta).encode())
+        return CachedPage(url, content, encoding, validators, meta["stored_at"], 'miss')
+
+    def touch(self, url, page):
+        """Mark a revalidated page as fresh again"""
+        meta_path, _ = self._paths(url)
+        page.fetched_at = time.time()
+        meta = {"url": url, "encoding": page.encoding, "headers": page.headers, "stored_at": page.fetched_at}
+        self._write(meta_path, json.dumps(meta).encode())
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least ``min_interval`` seconds apart"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        if self.min_interval <= 0:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def delay(self, url, seconds):
+        """Keep the host quiet for a while (after a 429 with Retry-After)"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._next[host] = max(self._next.get(host, 0), time.monotonic() + seconds)
+
+
+class CachedFetcher:
+    """GETs through a ResponseCache, a HostRateLimiter and retries with backoff"""
+
+    def __init__(self, session, cache=None, ttl=600, min_interval=2.0,
+                 retries=3, backoff=0.5, max_backoff=30.0):
+        self.session = session
+        self.cache = cache
+        self.ttl = ttl
+        self.limiter = HostRateLimiter(min_interval)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry ``attempt`` (1-based), honouring Retry-After"""
+        delay = min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(max(delay, int(retry_after)), self.max_backoff)
+        # Jitter so parallel scrapers don't retry in lockstep
+        return delay * random.uniform(0.8, 1.2)
+
+    def get(self, url, timeout=5, source=''):
+        cached = self.cache.get(url) if self.cache else None
+        if cached and time.time() - cached.fetched_at < self.ttl:
+            CACHE_RESULTS.inc(source=source, result='fresh')
+            return cached
+
+        headers = {}
+        if cached:
+            if 'ETag' in cached.headers:
+                headers['If-None-Match'] = cached.headers['ETag']
+            if 'Last-Modified' in cached.headers:
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(url)
+            try:
+                response = self.session.get(url, timeout=timeout, headers=headers)
+            except requests.RequestException as e:
+                # A timeout already used up the caller's time budget, don't retry it
+                if attempt == self.retries or isinstance(e, requests.Timeout):
+                    if cached:
+                        return self._stale(cached, source)
+                    raise
+                time.sleep(self._backoff(attempt + 1))
+                continue
+
+            if response.status_code == 304 and cached:
+                self.cache.touch(url, cached)
+                cached.result = 'revalidated'
+                CACHE_RESULTS.inc(source=source, result='revalidated')
+                return cached
+            if response.status_code in RETRY_STATUSES:
+                delay = self._backoff(attempt + 1, response)
+                if response.status_code == 429:
+                    self.limiter.delay(url, delay)
+                if attempt == self.retries:
+                    if cached:
+                        return self._stale(cached, source)
+                    response.raise_for_status()
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            CACHE_RESULTS.inc(source=source, result='miss')
+            if self.cache:
+                return self.cache.put(url, response.content, response.encoding, response.headers)
+            return CachedPage(url, response.content, response.encoding, dict(response.headers), time.time(), 'miss')
+
+    def _stale(self, cached, source):
+        """The old copy, when the site keeps failing"""
+        cached.result = 'stale'
+        CACHE_RESULTS.inc(source=source, result='stale')
+        return cached
@@ -1,16 +1,48 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
 import re
 from datetime import datetime
 import time
 import random
+from extractors import get_extractor
+from metrics import SCRAPE_BYTES, SCRAPE_ERRORS, SCRAPE_LATENCY
+from scrape_cache import CachedFetcher, ResponseCache
+
+# Pages scraped by scrape_all_sources_concurrent, by source name
+SOURCES = {
+    "commodityonline": "https://www.commodityonline.com/mandiprices/coconut/tamil-nadu",
+}
+
+# Fetched pages are reused for CACHE_TTL seconds, then revalidated
+CACHE_DIR = 'data/http_cache'
+CACHE_TTL = 600
+
+# Seconds between two requests to the same site
+MIN_HOST_INTERVAL = 2.0
+
+# Scraped ₹/kg prices outside this range are parse mistakes
+PRICE_RANGE = (20, 40)
 
 class CoconutPriceScraper:
-    def __init__(self):
+    def __init__(self, sources=None, max_workers=8, cache_dir=CACHE_DIR, cache_ttl=CACHE_TTL,
+                 min_host_interval=MIN_HOST_INTERVAL):
+        self.sources = sources if sources is not None else SOURCES
+        self.max_workers = max_workers
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # One keep-alive pool per host, big enough for every worker thread
+        adapter = HTTPAdapter(pool_connections=max(len(self.sources), 1), pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # cache_dir=None turns the response cache off
+        self.fetcher = CachedFetcher(self.session, ResponseCache(cache_dir) if cache_dir else None,
+                                     ttl=cache_ttl, min_interval=min_host_interval)
+        # Parsed prices per URL, reused while the page is unchanged
+        self._parsed = {}
     
     def scrape_all_sources(self):
         """Simulated scraping for demo"""
@@ -42,6 +74,63 @@ class CoconutPriceScraper:
         print(f"✅ Simulated scraping: {len(scraped_prices)} prices")
         return scraped_prices
     
+    def scrape_source(self, source, url, timeout=5):
+        """Fetch one source page and pull the price rows out of it"""
+        try:
+            with SCRAPE_LATENCY.time(source=source, phase='fetch'):
+                page = self.fetcher.get(url, timeout=timeout, source=source)
+        except Exception:
+            SCRAPE_ERRORS.inc(source=source)
+            raise
+        if page.result == 'miss':
+            SCRAPE_BYTES.inc(len(page.content), source=source)
+        
+        # An unchanged page (cached or 304) isn't parsed again
+        parsed = self._parsed.get(url)
+        if parsed is None or parsed[0] != page.version:
+            with SCRAPE_LATENCY.time(source=source, phase='parse'):
+                rows = get_extractor(source).extract(page.text)
+            low, high = PRICE_RANGE
+            parsed = self._parsed[url] = (page.version, [row for row in rows if low <= row["modal"] <= high])
+        
+        return [{
+            "source": source,
+            "price": row["modal"],
+            "market": row["market"],
+            "min_price": row["min"],
+            "max_price": row["max"],
+            "timestamp": datetime.now().isoformat(),
+            "url": url
+        } for row in parsed[1]]
+    
+    def scrape_all_sources_concurrent(self, timeout=5, deadline=15):
+        """Scrape every source in parallel.
+        
+        timeout applies to each request; deadline bounds the whole refresh.
+        Sources that fail or are still running at the deadline are left out,
+        so a slow site gives a partial result instead of stalling the refresh.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {
+            executor.submit(self.scrape_source, source, url, timeout): source
+            for source, url in self.sources.items()
+        }
+        done, not_done = wait(futures, timeout=deadline)
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        scraped_prices = []
+        for future, source in futures.items():
+            if future in not_done:
+                print(f"⚠️  {source} missed the {deadline}s deadline")
+                continue
+            try:
+                scraped_prices.extend(future.result())
+            except Exception as e:
+                print(f"⚠️  {source} failed: {e}")
+        
+        print(f"✅ Scraped {len(scraped_prices)} prices from {len(done)}/{len(futures)} sources")
+        return scraped_prices
+    
     # Real scraping functions (commented for demo)
     """
     def scrape_commodityonline(self):
@@ -1,98 +1,332 @@
 #!/usr/bin/env python3
+"""Create the data files for the backend.
+
+Without options this writes the small demo dataset. With --hours/--years
+or --submissions it streams a seeded synthetic dataset of any size to
+disk in the chosen storage format:
+
+    python setup.py --years 3 --submissions 2000000 --format sqlite
+"""
+import argparse
+import math
 import os
 import json
 import random
 from datetime import datetime, timedelta
 
-print("🚀 Setting up Simple Coconut Price Backend...")
-print("=" * 50)
-
-# Create data directory
-os.makedirs('data', exist_ok=True)
-
-# Create initial prices.json
-print("📊 Creating sample price data...")
-
-prices = []
-base_date = datetime.now() - timedelta(days=30)
-
-for i in range(30):
-    date = base_date + timedelta(days=i)
-    
-    # Generate realistic price trend
-    base_price = 24 + (i * 0.15)  # Slowly increasing trend
-    variation = 1.5
-    
-    avg_price = round(base_price + (random.uniform(-variation, variation)), 1)
-    min_price = round(avg_price - random.uniform(1, 2.5), 1)
-    max_price = round(avg_price + random.uniform(1, 2.5), 1)
-    
-    price_entry = {
-        "id": i + 1,
-        "average_price": avg_price,
-        "min_price": min_price,
-        "max_price": max_price,
-        "source_count": random.randint(3, 5),
-        "sources": [
-            {"source": "commodityonline", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()},
-            {"source": "commoditymarketlive", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()},
-            {"source": "kisantak", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()}
-        ],
-        "timestamp": date.isoformat()
-    }
+SOURCES = ["commodityonline", "commoditymarketlive", "kisantak", "krishidunia"]
+
+# Typical offset of each source from the market price
+SOURCE_BIAS = {"commodityonline": 0.0, "commoditymarketlive": 0.5, "kisantak": -0.8, "krishidunia": 0.3}
+
+# The big coconut-growing districts get more submissions
+DISTRICT_WEIGHTS = {"Coimbatore": 8, "Tiruppur": 6, "Thanjavur": 5, "Dindigul": 4, "Kanyakumari": 4,
+                    "Theni": 3, "Erode": 3, "Krishnagiri": 2, "Vellore": 2}
+
+MARKET_KINDS = ["Uzhavar Sandhai", "Regulated Market", "Wholesale Market", "Weekly Shandy", "Town Market"]
+
+OUTPUT_FORMATS = ('json', 'columnar', 'sqlite')
+
+# Rows per write when streaming into SQLite
+SQLITE_CHUNK = 10000
+
+# The json and columnar backends' files in the data directory; a new dataset
+# replaces all of them, or the stores would replay or merge the old data
+DATA_FILES = [
+    'prices.json', 'prices.cph',
+    'submissions.json', 'submissions.jsonl', 'submissions.jsonl.compacting', 'submissions.jsonl.ids'
+]
+
+# The SQLite database and its WAL and shared-memory files
+SQLITE_SUFFIXES = ('', '-wal', '-shm')
+
+
+def sqlite_file(data_dir):
+    """The database the sqlite backend uses: COCONUT_SQLITE_FILE as in app.py, else coconut.db in data_dir"""
+    return os.environ.get('COCONUT_SQLITE_FILE') or os.path.join(data_dir, 'coconut.db')
+
+
+def clear_data_files(data_dir, sqlite=False):
+    """Remove the json and columnar data files from data_dir, and the SQLite database if ``sqlite``.
+
+    Without ``sqlite`` an existing database is kept: it may hold real
+    submissions, and nothing written here reads it.
+    """
+    paths = [os.path.join(data_dir, name) for name in DATA_FILES]
+    if sqlite:
+        paths += [sqlite_file(data_dir) + suffix for suffix in SQLITE_SUFFIXES]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"🗑️  Removed old {path}")
+    if not sqlite and os.path.exists(sqlite_file(data_dir)):
+        print(f"ℹ️  Kept {sqlite_file(data_dir)} (pass --force to remove it too)")
+
+
+def create_demo_data(force=False):
+    """30 days of fake prices (the last 7 kept) and two sample submissions.
+
+    Only writes JSON, so the SQLite database is left alone unless ``force``.
+    """
+    print("🚀 Setting up Simple Coconut Price Backend...")
+    print("=" * 50)
+    
+    # Create data directory
+    os.makedirs('data', exist_ok=True)
+    clear_data_files('data', sqlite=force)
+    
+    # Create initial prices.json
+    print("📊 Creating sample price data...")
     
-    prices.append(price_entry)
-
-prices_data = {
-    "prices": prices[-7:],  # Keep only last 7 days for demo
-    "last_updated": datetime.now().isoformat()
-}
-
-with open('data/prices.json', 'w') as f:
-    json.dump(prices_data, f, indent=2)
-
-print(f"✅ Created {len(prices_data['prices'])} price entries")
-
-# Create empty submissions.json
-print("📝 Creating submissions file...")
-
-sample_submissions = [
-    {
-        "id": 1,
-        "type": "correction",
-        "user_price": 31.5,
-        "system_price": 28.5,
-        "district": "Chennai",
-        "market": "Koyambedu Market",
-        "contact": "+91 9876543210",
-        "timestamp": (datetime.now() - timedelta(days=2)).isoformat(),
-        "status": "pending",
-        "notes": "Price seems higher in local market"
-    },
-    {
-        "id": 2,
-        "type": "new_submission",
-        "user_price": 29.0,
-        "district": "Coimbatore",
-        "market": "Gandhipuram Market",
-        "contact": "+91 9876543211",
-        "timestamp": (datetime.now() - timedelta(days=1)).isoformat(),
-        "status": "approved",
-        "notes": "Verified by admin"
+    prices = []
+    base_date = datetime.now() - timedelta(days=30)
+    
+    for i in range(30):
+        date = base_date + timedelta(days=i)
+    
+        # Generate realistic price trend
+        base_price = 24 + (i * 0.15)  # Slowly increasing trend
+        variation = 1.5
+    
+        avg_price = round(base_price + (random.uniform(-variation, variation)), 1)
+        min_price = round(avg_price - random.uniform(1, 2.5), 1)
+        max_price = round(avg_price + random.uniform(1, 2.5), 1)
+    
+        price_entry = {
+            "id": i + 1,
+            "average_price": avg_price,
+            "min_price": min_price,
+            "max_price": max_price,
+            "source_count": random.randint(3, 5),
+            "sources": [
+                {"source": "commodityonline", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()},
+                {"source": "commoditymarketlive", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()},
+                {"source": "kisantak", "price": random.randint(int(min_price), int(max_price)), "timestamp": date.isoformat()}
+            ],
+            "timestamp": date.isoformat()
+        }
+    
+        prices.append(price_entry)
+    
+    prices_data = {
+        "prices": prices[-7:],  # Keep only last 7 days for demo
+        "last_updated": datetime.now().isoformat()
     }
-]
+    
+    with open('data/prices.json', 'w') as f:
+        json.dump(prices_data, f, indent=2)
+    
+    print(f"✅ Created {len(prices_data['prices'])} price entries")
+    
+    # Create empty submissions.json
+    print("📝 Creating submissions file...")
+    
+    sample_submissions = [
+        {
+            "id": 1,
+            "type": "correction",
+            "user_price": 31.5,
+            "system_price": 28.5,
+            "district": "Chennai",
+            "market": "Koyambedu Market",
+            "contact": "+91 9876543210",
+            "timestamp": (datetime.now() - timedelta(days=2)).isoformat(),
+            "status": "pending",
+            "notes": "Price seems higher in local market"
+        },
+        {
+            "id": 2,
+            "type": "new_submission",
+            "user_price": 29.0,
+            "district": "Coimbatore",
+            "market": "Gandhipuram Market",
+            "contact": "+91 9876543211",
+            "timestamp": (datetime.now() - timedelta(days=1)).isoformat(),
+            "status": "approved",
+            "notes": "Verified by admin"
+        }
+    ]
+    
+    with open('data/submissions.json', 'w') as f:
+        json.dump(sample_submissions, f, indent=2)
+    
+    print(f"✅ Created {len(sample_submissions)} sample submissions")
+    
+    print("=" * 50)
+    print("✅ Setup complete!")
+    print("")
+    print("To run the backend:")
+    print("  python app.py")
+    print("")
+    print("The server will start at: http://localhost:5000")
+    print("")
+    print("📱 For React app, use API_BASE_URL = 'http://localhost:5000/api'")
 
-with open('data/submissions.json', 'w') as f:
-    json.dump(sample_submissions, f, indent=2)
 
-print(f"✅ Created {len(sample_submissions)} sample submissions")
+def market_price(moment):
+    """Seasonal baseline price at a moment: yearly cycle plus a weekly ripple"""
+    day = moment.timetuple().tm_yday + moment.hour / 24
+    return 28 + 2.5 * math.sin(2 * math.pi * day / 365.25) + 0.4 * math.sin(2 * math.pi * day / 7)
+
+
+def generate_prices(rng, start, hours):
+    """Hourly price entries with every source, oldest first"""
+    drift = 0.0
+    for i in range(hours):
+        moment = start + timedelta(hours=i)
+        # Mean-reverting random walk around the seasonal baseline
+        drift += rng.gauss(0, 0.08) - drift * 0.01
+        level = market_price(moment) + drift
+        timestamp = moment.isoformat()
+        samples = [
+            {"source": source, "price": int(round(level + SOURCE_BIAS[source] + rng.gauss(0, 0.8))),
+             "timestamp": timestamp}
+            for source in SOURCES if rng.random() < 0.9
+        ] or [{"source": SOURCES[0], "price": int(round(level)), "timestamp": timestamp}]
+        prices = [sample["price"] for sample in samples]
+        yield {
+            "id": i + 1,
+            "average_price": round(sum(prices) / len(prices), 2),
+            "min_price": min(prices),
+            "max_price": max(prices),
+            "source_count": len(prices),
+            "sources": samples,
+            "timestamp": timestamp
+        }
+
+
+def generate_submissions(rng, start, end, count):
+    """Submissions spread evenly over [start, end), oldest first"""
+    from districts import TAMIL_NADU_DISTRICTS
+    
+    districts = TAMIL_NADU_DISTRICTS
+    weights = [DISTRICT_WEIGHTS.get(district, 1) for district in districts]
+    offsets = {district: rng.gauss(0, 1.0) for district in districts}
+    span = (end - start).total_seconds()
+    recent = end - timedelta(days=7)
+    
+    for i in range(count):
+        moment = start + timedelta(seconds=(i + rng.random()) * span / count)
+        district = rng.choices(districts, weights)[0]
+        system_price = round(market_price(moment), 1)
+        user_price = system_price + offsets[district] + rng.gauss(0, 1.2)
+        if rng.random() < 0.01:
+            user_price *= rng.choice([0.4, 2.5])
+        
+        # Older submissions have mostly been reviewed
+        if moment < recent:
+            status = rng.choices(["approved", "rejected", "pending"], [75, 15, 10])[0]
+        else:
+            status = rng.choices(["pending", "approved", "rejected"], [60, 35, 5])[0]
+        
+        record = {
+            "id": i + 1,
+            "type": "correction" if rng.random() < 0.3 else "new_submission",
+            "user_price": round(user_price, 1),
+            "district": district,
+            "market": f"{district} {rng.choice(MARKET_KINDS)}",
+            "contact": f"+91 9{rng.randrange(10 ** 9):09d}" if rng.random() < 0.6 else "",
+            "timestamp": moment.isoformat(),
+            "status": status,
+            "notes": ""
+        }
+        if record["type"] == "correction":
+            record["system_price"] = system_price
+            record["notes"] = "User reported incorrect price"
+        if status != "pending":
+            record["reviewed_at"] = (moment + timedelta(hours=rng.uniform(1, 48))).isoformat()
+        yield record
+
+
+def write_json_array(path, items, prefix='[', suffix=']'):
+    """Stream items into a JSON array without building it in memory; returns the count"""
+    count = 0
+    with open(path, 'w') as f:
+        f.write(prefix)
+        for item in items:
+            f.write((',\n' if count else '\n') + json.dumps(item))
+            count += 1
+        f.write('\n' + suffix)
+    return count
+
+
+def chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate(data_dir='data', output_format='json', hours=24 * 365, submissions=100000, seed=42, end=None,
+             force=False):
+    """Write a synthetic dataset ending at ``end`` (default: this hour) in one storage format.
+
+    json writes prices.json and submissions.json, columnar writes
+    prices.cph and submissions.json, sqlite writes the database
+    (``sqlite_file``). The json and columnar files already in ``data_dir``
+    are removed first, and the database too when writing sqlite or with
+    ``force``. Entries are generated and written one at a time (in chunks
+    for SQLite), so memory stays flat however large the dataset.
+    """
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    clear_data_files(data_dir, sqlite=force or output_format == 'sqlite')
+    end = end or datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(hours=hours - 1)
+    prices = generate_prices(rng, start, hours)
+    records = generate_submissions(random.Random(seed + 1), start, end + timedelta(hours=1), submissions)
+    
+    if output_format == 'sqlite':
+        from sqlite_store import SqliteDatabase, SqlitePriceStore, SqliteSubmissionStore
+        db = SqliteDatabase(sqlite_file(data_dir))
+        for chunk in chunks(prices, SQLITE_CHUNK):
+            SqlitePriceStore(db).import_entries(chunk, end.isoformat())
+        for chunk in chunks(records, SQLITE_CHUNK):
+            SqliteSubmissionStore(db).import_records(chunk)
+        return
+    
+    if output_format == 'columnar':
+        from columnar import ColumnBuilder
+        builder = ColumnBuilder()
+        for entry in prices:
+            builder.add(entry)
+        builder.write(os.path.join(data_dir, 'prices.cph'), last_updated=end.isoformat())
+    else:
+        write_json_array(os.path.join(data_dir, 'prices.json'), prices,
+                         prefix='{"prices": [', suffix=f'], "last_updated": {json.dumps(end.isoformat())}}}')
+    write_json_array(os.path.join(data_dir, 'submissions.json'), records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the backend's data files")
+    parser.add_argument('--hours', type=int, help="hourly price entries to generate")
+    parser.add_argument('--years', type=float, help="years of hourly prices (instead of --hours)")
+    parser.add_argument('--submissions', type=int, help="submissions to generate")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json', help="storage format to write")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--force', action='store_true',
+                        help="also remove the SQLite database when writing another format")
+    args = parser.parse_args()
+    
+    if args.hours is None and args.years is None and args.submissions is None:
+        create_demo_data(args.force)
+        return
+    
+    hours = args.hours or int((args.years or 1) * 365 * 24)
+    submissions = args.submissions if args.submissions is not None else 100000
+    print(f"🚀 Generating {hours} hours of prices and {submissions} submissions "
+          f"({args.format}, seed {args.seed}) in {args.data_dir}/...")
+    started = datetime.now()
+    generate(args.data_dir, args.format, hours, submissions, args.seed, force=args.force)
+    print(f"✅ Done in {(datetime.now() - started).total_seconds():.1f}s")
+    if args.format != 'json':
+        print(f"   Run the backend with COCONUT_STORAGE={args.format}")
+
 
-print("=" * 50)
-print("✅ Setup complete!")
-print("")
-print("To run the backend:")
-print("  python app.py")
-print("")
-print("The server will start at: http://localhost:5000")
-print("")
-print("📱 For React app, use API_BASE_URL = 'http://localhost:5000/api'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
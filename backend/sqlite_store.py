@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""SQLite storage backend for prices and submissions.
+
+Used instead of the JSON files when COCONUT_STORAGE=sqlite. Run this file
+to import the existing data/*.json files into the database:
+
+    python sqlite_store.py [data/coconut.db]
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from districts import normalize_district
+from rollups import PriceBuckets, bucket_start
+from storage import PriceStore, SubmissionLog, parse_timestamp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    average_price REAL NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    source_count INTEGER NOT NULL,
+    sources TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_prices_timestamp ON prices (timestamp);
+
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT,
+    district TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL,
+    -- normalize_district(district), set by the writers
+    canonical_district TEXT,
+    -- submissions_version of the write that inserted / last changed the row
+    created_version INTEGER NOT NULL DEFAULT 0,
+    updated_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions (status);
+CREATE INDEX IF NOT EXISTS idx_submissions_district ON submissions (district);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp ON submissions (timestamp);
+-- Keyset pagination, overall and within a status
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp_id ON submissions (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_status_timestamp_id ON submissions (status, timestamp, id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Previous version of each updated submission, for views catching up
+-- on other processes' writes
+CREATE TABLE IF NOT EXISTS submission_changes (
+    version INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    old TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submission_changes_version ON submission_changes (version);
+
+-- Submissions per status, kept in step with the submissions table
+CREATE TABLE IF NOT EXISTS submission_counts (
+    status TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS submissions_counts_insert AFTER INSERT ON submissions BEGIN
+    INSERT INTO submission_counts (status, count) VALUES (COALESCE(NEW.status, ''), 1)
+    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS submissions_counts_delete AFTER DELETE ON submissions BEGIN
+    UPDATE submission_counts SET count = count - 1 WHERE status = COALESCE(OLD.status, '');
+END;
+CREATE TRIGGER IF NOT EXISTS submissions_counts_update AFTER UPDATE OF status ON submissions
+WHEN OLD.status IS NOT NEW.status BEGIN
+    UPDATE submission_counts SET count = count - 1 WHERE status = COALESCE(OLD.status, '');
+    INSERT INTO submission_counts (status, count) VALUES (COALESCE(NEW.status, ''), 1)
+    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+"""
+
+
+class SqliteDatabase:
+    """One connection per thread to a WAL-mode database file"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._local = threading.local()
+        if hasattr(os, 'register_at_fork'):
+            # A forked worker must open its own connections, not reuse the parent's
+            os.register_at_fork(after_in_child=self._forget_connections)
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        with self.transaction() as conn:
+            # Databases created before the version columns existed
+            columns = {row["name"] for row in conn.execute('PRAGMA table_info(submissions)')}
+            for column in ('created_version', 'updated_version'):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE submissions ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+            if 'canonical_district' not in columns:
+                conn.execute('ALTER TABLE submissions ADD COLUMN canonical_district TEXT')
+                conn.execute('UPDATE submissions SET canonical_district = canonical_district(district)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_submissions_updated_version '
+                         'ON submissions (updated_version)')
+            # Keyset pagination within a district
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_submissions_canonical_district_timestamp_id '
+                         'ON submissions (canonical_district, timestamp, id)')
+            # Databases created before submission_counts existed
+            counted = conn.execute('SELECT COALESCE(SUM(count), 0) FROM submission_counts').fetchone()[0]
+            total = conn.execute('SELECT COUNT(*) FROM submissions').fetchone()[0]
+            if counted != total:
+                conn.execute('DELETE FROM submission_counts')
+                conn.execute("INSERT INTO submission_counts (status, count) "
+                             "SELECT COALESCE(status, ''), COUNT(*) FROM submissions GROUP BY 1")
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: we issue BEGIN ourselves for writes
+            conn = sqlite3.connect(self.filepath, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # REPLACE must fire the delete trigger that keeps submission_counts right
+            conn.execute('PRAGMA recursive_triggers=ON')
+            # Fills the canonical_district column of databases from before it existed
+            conn.create_function('canonical_district', 1, normalize_district, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        """Immediate (write-locked) transaction on this thread's connection"""
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            # Every committed write moves the data version on
+            conn.execute("INSERT INTO meta (key, value) VALUES ('version', 1) "
+                         "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def version(self):
+        """Counter bumped by every write transaction, from any process"""
+        row = self.connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def write(self, statements):
+        """Run (sql, params) pairs in one immediate transaction, return the cursors"""
+        with self.transaction() as conn:
+            return [conn.execute(sql, params) for sql, params in statements]
+
+
+class SqlitePriceStore:
+    """Price history in the prices table"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def version(self):
+        return self.db.version()
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "id": row["id"],
+            "average_price": row["average_price"],
+            "min_price": row["min_price"],
+            "max_price": row["max_price"],
+            "source_count": row["source_count"],
+            "sources": json.loads(row["sources"]),
+            "timestamp": row["timestamp"]
+        }
+
+    def latest(self):
+        row = self.db.connect().execute(
+            'SELECT * FROM prices ORDER BY id DESC LIMIT 1').fetchone()
+        return self._entry(row) if row else None
+
+    def between(self, start=None, end=None):
+        """Price entries between two epoch timestamps, oldest first"""
+        # Timestamps are naive local ISO strings, which sort in time order
+        lower = datetime.fromtimestamp(start).isoformat() if start is not None else ''
+        upper = datetime.fromtimestamp(end).isoformat() if end is not None else '~'
+        rows = self.db.connect().execute(
+            'SELECT * FROM prices WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp',
+            (lower, upper)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def iter_between(self, start=None, end=None):
+        """Iterate price entries between two epoch timestamps without loading them all"""
+        lower = datetime.fromtimestamp(start).isoformat() if start is not None else ''
+        upper = datetime.fromtimestamp(end).isoformat() if end is not None else '~'
+        cursor = self.db.connect().execute(
+            'SELECT * FROM prices WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp',
+            (lower, upper))
+        for row in cursor:
+            yield self._entry(row)
+
+    def buckets(self, resolution, start=None, end=None):
+        """OHLC buckets ('hour', 'day' or 'week') between two epoch timestamps.
+
+        Built per query from the timestamp index without decoding sources;
+        other processes may write to the database, so nothing is cached.
+        """
+        lower = bucket_start(start, resolution).isoformat() if start is not None else ''
+        upper = datetime.fromtimestamp(end).isoformat() if end is not None else '~'
+        buckets = PriceBuckets()
+        rows = self.db.connect().execute(
+            'SELECT timestamp, average_price FROM prices WHERE timestamp >= ? AND timestamp <= ?',
+            (lower, upper))
+        for timestamp, average_price in rows:
+            buckets.add(parse_timestamp(timestamp), average_price)
+        return buckets.between(resolution, start, end)
+
+    def count(self):
+        return self.db.connect().execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+
+    def append(self, entry, keep_days=30):
+        """Add a price entry and drop entries older than keep_days.
+
+        Unlike prices.json, ids are not renumbered after pruning.
+        """
+        cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO prices (average_price, min_price, max_price, source_count, sources, timestamp) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (entry["average_price"], entry["min_price"], entry["max_price"],
+                 entry["source_count"], json.dumps(entry["sources"]), entry["timestamp"]))
+            conn.execute('DELETE FROM prices WHERE timestamp <= ?', (cutoff,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)",
+                         (datetime.now().isoformat(),))
+            self._update_stats(conn)
+        return {"id": cursor.lastrowid, **entry}
+
+    @staticmethod
+    def _update_stats(conn):
+        """Recompute the /api/stats figures inside a write transaction"""
+        latest = conn.execute(
+            'SELECT average_price, timestamp FROM prices ORDER BY timestamp DESC LIMIT 2').fetchall()
+        if not latest:
+            conn.execute("DELETE FROM meta WHERE key = 'stats'")
+            return
+        week_start = (datetime.fromisoformat(latest[0]["timestamp"]) - timedelta(days=7)).isoformat()
+        average, minimum, maximum = conn.execute(
+            'SELECT AVG(average_price), MIN(average_price), MAX(average_price) '
+            'FROM prices WHERE timestamp > ?', (week_start,)).fetchone()
+        change = 0
+        if len(latest) == 2:
+            previous = latest[1]["average_price"]
+            change = round(((latest[0]["average_price"] - previous) / previous) * 100, 1)
+        stats = {
+            "seven_day_average": round(average, 2),
+            "seven_day_min": minimum,
+            "seven_day_max": maximum,
+            "latest_change": change,
+            "data_points": conn.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+        }
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stats', ?)", (json.dumps(stats),))
+
+    def stats(self):
+        """Rolling aggregates stored by the last write"""
+        conn = self.db.connect()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'stats'").fetchone()
+        if row is None:
+            # No prices, no stats: don't take the write lock on a read
+            if conn.execute('SELECT 1 FROM prices LIMIT 1').fetchone() is None:
+                return None
+            # Databases written before stats were stored
+            with self.db.transaction() as conn:
+                self._update_stats(conn)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'stats'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def import_entries(self, entries, last_updated=None):
+        statements = [
+            ('INSERT OR REPLACE INTO prices (id, average_price, min_price, max_price, source_count, sources, timestamp) '
+             'VALUES (?, ?, ?, ?, ?, ?, ?)',
+             (p["id"], p["average_price"], p["min_price"], p["max_price"],
+              p["source_count"], json.dumps(p.get("sources", [])), p["timestamp"]))
+            for p in entries
+        ]
+        if last_updated:
+            statements.append(
+                ("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)", (last_updated,)))
+        with self.db.transaction() as conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            self._update_stats(conn)
+
+
+class SqliteSubmissionStore:
+    """User submissions in the submissions table.
+
+    status, district and timestamp are indexed columns; the full record is
+    kept as JSON in ``data`` so new fields need no schema change.
+
+    Every write moves ``submissions_version`` on and stamps the rows it
+    touches with it; updates also keep the replaced record in
+    submission_changes. ``sync`` passes subscribed views just the rows
+    written since they were last in step, with the version of each they
+    had seen.
+    """
+
+    # Updates kept in submission_changes; a view further behind is rebuilt
+    CHANGE_HISTORY = 10000
+
+    def __init__(self, db):
+        self.db = db
+        self._listeners = []
+        self._listeners_lock = threading.RLock()
+        self._synced_version = None
+
+    def version(self):
+        return self.db.version()
+
+    @staticmethod
+    def _submissions_version(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'submissions_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    @classmethod
+    def _bump(cls, conn):
+        """Move submissions_version on inside a write, return (before, after)"""
+        before = cls._submissions_version(conn)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('submissions_version', ?)", (before + 1,))
+        return before, before + 1
+
+    @staticmethod
+    def _changes_from(conn):
+        """Oldest submissions_version a view can catch up from without a rebuild"""
+        row = conn.execute("SELECT value FROM meta WHERE key = 'submission_changes_from'").fetchone()
+        return int(row[0]) if row else 0
+
+    def subscribe(self, listener):
+        """Keep a view in step with the submissions, like SubmissionLog.subscribe"""
+        with self._listeners_lock:
+            self._listeners.append(listener)
+            self._resync()
+
+    def _resync(self):
+        conn = self.db.connect()
+        # Version and rows from one read snapshot so they match
+        conn.execute('BEGIN')
+        try:
+            version = self._submissions_version(conn)
+            records = [json.loads(row[0]) for row in conn.execute('SELECT data FROM submissions ORDER BY id')]
+        finally:
+            conn.execute('COMMIT')
+        for listener in self._listeners:
+            listener.reset(records)
+        self._synced_version = version
+
+    def sync(self):
+        """Pass subscribed views the submissions other processes have written since"""
+        with self._listeners_lock:
+            if not self._listeners or self._synced_version is None:
+                return
+            conn = self.db.connect()
+            if self._submissions_version(conn) == self._synced_version:
+                return
+            synced = self._synced_version
+            conn.execute('BEGIN')
+            try:
+                version = self._submissions_version(conn)
+                if synced < self._changes_from(conn):
+                    changes = None
+                else:
+                    rows = conn.execute(
+                        'SELECT id, data, created_version FROM submissions WHERE updated_version > ? '
+                        'ORDER BY updated_version, id', (synced,)).fetchall()
+                    # The first replacement after ``synced`` is the version the views saw
+                    seen = {}
+                    for row in conn.execute('SELECT id, old FROM submission_changes WHERE version > ? '
+                                            'ORDER BY version DESC', (synced,)):
+                        seen[row["id"]] = row["old"]
+                    changes = []
+                    for row in rows:
+                        if row["created_version"] > synced:
+                            old = None
+                        elif row["id"] in seen:
+                            old = json.loads(seen[row["id"]])
+                        else:
+                            # Written without a change record; rebuild
+                            changes = None
+                            break
+                        changes.append((old, json.loads(row["data"])))
+            finally:
+                conn.execute('COMMIT')
+            if changes is None:
+                self._resync()
+                return
+            for old, new in changes:
+                for listener in self._listeners:
+                    listener.change(old, new)
+            self._synced_version = version
+
+    def _notify(self, versions, changes):
+        """Pass our own committed changes to the views, if nothing else came in between"""
+        before, after = versions
+        with self._listeners_lock:
+            if not self._listeners or before != self._synced_version:
+                # Out of step; the next sync() rebuilds the views
+                return
+            for old, new in changes:
+                for listener in self._listeners:
+                    listener.change(old, new)
+            self._synced_version = after
+
+    def get(self, submission_id):
+        row = self.db.connect().execute(
+            'SELECT data FROM submissions WHERE id = ?', (submission_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter(self, status=None, start=None, end=None):
+        """Iterate submissions in id order, filtered by status and ISO timestamp range.
+
+        Workers take ids in blocks (see group_commit), so id order is write
+        order only within one process.
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if start:
+            conditions.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            conditions.append('timestamp <= ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self.db.connect().execute(f'SELECT data FROM submissions {where} ORDER BY id', params)
+        for row in cursor:
+            yield json.loads(row[0])
+
+    def page(self, status=None, district=None, after=None, limit=100, descending=False):
+        """Same as SubmissionLog.page, served from the (status|canonical_district, timestamp, id) indexes"""
+        conditions, params = [], []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if district:
+            conditions.append('canonical_district = ?')
+            params.append(district)
+        if after:
+            conditions.append(f"(timestamp, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        direction = 'DESC' if descending else 'ASC'
+        rows = self.db.connect().execute(
+            f'SELECT data FROM submissions {where} ORDER BY timestamp {direction}, id {direction} LIMIT ?',
+            params + [limit]).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, status=None):
+        if status:
+            return self.status_counts().get(status, 0)
+        return self.db.connect().execute(
+            'SELECT COALESCE(SUM(count), 0) FROM submission_counts').fetchone()[0]
+
+    def status_counts(self):
+        """Number of submissions per status, from the trigger-maintained table"""
+        rows = self.db.connect().execute(
+            "SELECT status, count FROM submission_counts WHERE count > 0 AND status != ''").fetchall()
+        return {status: count for status, count in rows}
+
+    def add(self, submission):
+        """Insert a submission and return it with its new id"""
+        return self.add_many([submission])[0]
+
+    @staticmethod
+    def _take_ids(conn, count):
+        """First of ``count`` new ids, inside a write transaction"""
+        # The write lock is held, so nobody else can take these ids
+        next_id = conn.execute(
+            "SELECT MAX((SELECT COALESCE(MAX(id), 0) + 1 FROM submissions), "
+            "COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'next_submission_id'), 0))"
+        ).fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_submission_id', ?)",
+                     (next_id + count,))
+        return next_id
+
+    def reserve_ids(self, count=1):
+        """Hand out ``count`` consecutive ids for records passed to add_many later"""
+        with self.db.transaction() as conn:
+            return self._take_ids(conn, count)
+
+    def add_many(self, submissions, sync=False):
+        """Insert several submissions in one transaction, keeping ids from reserve_ids.
+
+        ``sync`` commits with synchronous=FULL, so the write is on disk on return.
+        """
+        if sync:
+            # Per connection, and each thread has its own
+            self.db.connect().execute('PRAGMA synchronous=FULL')
+        with self.db.transaction() as conn:
+            first = self._take_ids(conn, sum(1 for s in submissions if "id" not in s))
+            records = []
+            for submission in submissions:
+                if "id" not in submission:
+                    submission = {"id": first, **submission}
+                    first += 1
+                records.append(submission)
+            versions = self._bump(conn)
+            version = versions[1]
+            conn.executemany(
+                'INSERT INTO submissions (id, status, district, canonical_district, timestamp, data, '
+                'created_version, updated_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(r["id"], r.get("status"), r.get("district"), normalize_district(r.get("district")),
+                  r.get("timestamp"), json.dumps(r), version, version)
+                 for r in records])
+        self._notify(versions, [(None, r) for r in records])
+        return records
+
+    def update(self, record):
+        with self.db.transaction() as conn:
+            row = conn.execute('SELECT data FROM submissions WHERE id = ?', (record["id"],)).fetchone()
+            versions = self._bump(conn)
+            version = versions[1]
+            conn.execute(
+                'UPDATE submissions SET status = ?, district = ?, canonical_district = ?, timestamp = ?, '
+                'data = ?, updated_version = ? WHERE id = ?',
+                (record.get("status"), record.get("district"), normalize_district(record.get("district")),
+                 record.get("timestamp"), json.dumps(record), version, record["id"]))
+            if row:
+                conn.execute('INSERT INTO submission_changes (version, id, old) VALUES (?, ?, ?)',
+                             (version, record["id"], row[0]))
+                self._forget_changes(conn, version - self.CHANGE_HISTORY)
+        self._notify(versions, [(json.loads(row[0]) if row else None, record)])
+        return record
+
+    @classmethod
+    def _forget_changes(cls, conn, before):
+        """Drop change records older than ``before``; views behind it are rebuilt on sync"""
+        if before > cls._changes_from(conn):
+            conn.execute('DELETE FROM submission_changes WHERE version < ?', (before,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('submission_changes_from', ?)",
+                         (before,))
+
+    def import_records(self, records):
+        with self.db.transaction() as conn:
+            _, version = self._bump(conn)
+            conn.executemany(
+                'INSERT OR REPLACE INTO submissions (id, status, district, canonical_district, timestamp, '
+                'data, created_version, updated_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(r["id"], r.get("status"), r.get("district"), normalize_district(r.get("district")),
+                  r.get("timestamp"), json.dumps(r), version, version)
+                 for r in records if "id" in r])
+            # Replaced rows leave no change record: views in step before this rebuild
+            self._forget_changes(conn, version)
+
+
+def migrate(db_path, prices_file='data/prices.json', submissions_file='data/submissions.json',
+            submissions_journal='data/submissions.jsonl'):
+    """Import the JSON data files into a SQLite database"""
+    db = SqliteDatabase(db_path)
+
+    prices_data = PriceStore(prices_file).load()
+    SqlitePriceStore(db).import_entries(prices_data["prices"], prices_data.get("last_updated"))
+    print(f"✅ Imported {len(prices_data['prices'])} price entries")
+
+    submissions = SubmissionLog(submissions_file, submissions_journal).load()
+    SqliteSubmissionStore(db).import_records(submissions)
+    print(f"✅ Imported {len(submissions)} submissions")
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else 'data/coconut.db'
+    print(f"🗄️  Migrating data/*.json into {target}...")
+    migrate(target)
@@ -0,0 +1,732 @@
+import bisect
+import copy
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from metrics import STORAGE_BYTES, STORAGE_LATENCY
+from rollups import MovingWindow, PriceBuckets
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# os.umask can only be read by setting it, so read it once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def replace_file(tmp_path, filepath):
+    """Move a finished temporary file over filepath, keeping filepath's permissions.
+
+    mkstemp creates files only their owner can read; a new file gets the
+    mode open() would have given it.
+    """
+    try:
+        mode = os.stat(filepath).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, filepath)
+
+
+def read_json_file(filepath):
+    """(data, stamp) of a JSON file, or None if it doesn't exist.
+
+    The stamp is taken from the open file before reading it, so it is
+    never newer than the data even if the file is replaced meanwhile.
+    """
+    try:
+        f = open(filepath, 'rb')
+    except FileNotFoundError:
+        return None
+    with STORAGE_LATENCY.time(operation='load', file=os.path.basename(filepath)):
+        with f:
+            st = os.fstat(f.fileno())
+            raw = f.read()
+        data = json.loads(raw)
+    STORAGE_BYTES.inc(len(raw), operation='load', file=os.path.basename(filepath))
+    return data, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def load_json_file(filepath, default_data):
+    """Load JSON file, create if doesn't exist"""
+    loaded = read_json_file(filepath)
+    if loaded is not None:
+        return loaded[0]
+    else:
+        # Create directory if needed
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        save_json_file(filepath, default_data)
+        return default_data
+
+def save_json_file(filepath, data):
+    """Save data to JSON file.
+
+    The data goes to a temporary file that then replaces the target, so
+    readers in other processes see either the old or the new file, never
+    a half-written one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or '.',
+                                    prefix=os.path.basename(filepath) + '.', suffix='.tmp')
+    try:
+        with STORAGE_LATENCY.time(operation='save', file=os.path.basename(filepath)):
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            replace_file(tmp_path, filepath)
+        STORAGE_BYTES.inc(size, operation='save', file=os.path.basename(filepath))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileLock:
+    """Exclusive lock held through a lock file, shared by threads and processes.
+
+    Reentrant for the thread holding it. The lock is advisory (flock, or
+    msvcrt.locking on Windows): it only keeps out code that takes it too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with ``blocking=False`` return False instead of waiting"""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                self._file = self._lock_file(blocking)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            if self._file is None:
+                self._thread_lock.release()
+                return False
+        self._depth += 1
+        return True
+
+    def _lock_file(self, blocking):
+        """The open, locked lock file; None if it is held elsewhere and ``blocking`` is false"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        f = open(self.path, 'a+b')
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    return None
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            f.close()
+                            return None
+                        # LK_LOCK gives up after 10 seconds, keep waiting
+                        continue
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            f, self._file = self._file, None
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            f.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class JsonFileStore:
+    """In-memory copy of a JSON file, reloaded only when the file changes on disk.
+
+    ``lock`` guards the in-memory copy within this process. Writers also
+    hold ``write_lock``, which other processes using the same file share,
+    and take it before ``lock``.
+    """
+
+    def __init__(self, filepath, default_data):
+        self.filepath = filepath
+        self.default_data = default_data
+        self.lock = threading.RLock()
+        self.write_lock = FileLock(filepath + '.lock')
+        self._data = None
+        self._stamp = None
+
+    def _disk_stamp(self):
+        """inode, mtime and size of the file, or None if it doesn't exist"""
+        try:
+            st = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """Return the cached data, re-reading the file if it was edited externally.
+
+        The returned object is shared between requests: callers that modify it
+        must hold ``self.write_lock`` and ``self.lock``, reload, and call
+        ``save`` afterwards.
+        """
+        with self.lock:
+            stamp = self._disk_stamp()
+            if self._data is None or stamp != self._stamp:
+                loaded = read_json_file(self.filepath)
+                while loaded is None:
+                    # Missing: write the default data and read it back
+                    load_json_file(self.filepath, copy.deepcopy(self.default_data))
+                    loaded = read_json_file(self.filepath)
+                self._data, self._stamp = loaded
+            return self._data
+
+    def version(self):
+        """Token that changes whenever the file is rewritten"""
+        return self._disk_stamp()
+
+    def save(self, data):
+        """Write data through to disk and keep it as the cached copy"""
+        with self.write_lock, self.lock:
+            save_json_file(self.filepath, data)
+            self._data = data
+            self._stamp = self._disk_stamp()
+
+
+def parse_timestamp(value):
+    """ISO timestamp string to epoch seconds"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class PriceHistory:
+    """Price entries in time order, indexed by their epoch timestamps.
+
+    Expired entries are dropped from the head by moving an offset, and
+    time ranges are found by binary search over the epochs. OHLC buckets
+    for charts and the 7-day window behind /api/stats are updated as
+    entries come and go.
+    """
+
+    def __init__(self, entries=()):
+        self._entries = []
+        self._epochs = []
+        self._head = 0
+        self.last_id = 0
+        self.buckets = PriceBuckets()
+        self.week = MovingWindow(7 * 24 * 3600)
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self):
+        return len(self._entries) - self._head
+
+    def append(self, entry):
+        epoch = parse_timestamp(entry["timestamp"])
+        self.last_id = max(self.last_id, entry.get("id") or 0)
+        if self._epochs and epoch < self._epochs[-1]:
+            # Out of order entries are rare (hand-edited files), keep them sorted
+            position = bisect.bisect_right(self._epochs, epoch, self._head)
+            self._epochs.insert(position, epoch)
+            self._entries.insert(position, entry)
+            self._rebuild_week()
+        else:
+            self._epochs.append(epoch)
+            self._entries.append(entry)
+            self.week.add(epoch, entry["average_price"])
+        self.buckets.add(epoch, entry["average_price"])
+
+    def _rebuild_week(self):
+        self.week = MovingWindow(self.week.seconds)
+        start = bisect.bisect_right(self._epochs, self._epochs[-1] - self.week.seconds, self._head)
+        for epoch, entry in zip(self._epochs[start:], self._entries[start:]):
+            self.week.add(epoch, entry["average_price"])
+
+    def expire(self, cutoff):
+        """Drop entries at or before the cutoff epoch"""
+        while self._head < len(self._epochs) and self._epochs[self._head] <= cutoff:
+            self._entries[self._head] = None
+            self._head += 1
+        self.buckets.expire(cutoff)
+        # Reclaim the dead head once it is most of the list
+        if self._head > 64 and self._head * 2 > len(self._entries):
+            del self._entries[:self._head]
+            del self._epochs[:self._head]
+            self._head = 0
+
+    def latest(self):
+        return self._entries[-1] if len(self) else None
+
+    def between(self, start=None, end=None):
+        """Entries with start <= epoch <= end, oldest first"""
+        lo = self._head if start is None else bisect.bisect_left(self._epochs, start, self._head)
+        hi = len(self._epochs) if end is None else bisect.bisect_right(self._epochs, end, self._head)
+        return self._entries[lo:hi]
+
+    def entries(self):
+        return self._entries[self._head:]
+
+    def summary(self):
+        """Rolling figures for /api/stats, or None without data"""
+        latest = self.latest()
+        if not latest:
+            return None
+        change = 0
+        if len(self) >= 2:
+            previous = self._entries[-2]["average_price"]
+            change = round(((latest["average_price"] - previous) / previous) * 100, 1)
+        return {
+            "seven_day_average": self.week.average(),
+            "seven_day_min": self.week.minimum(),
+            "seven_day_max": self.week.maximum(),
+            "latest_change": change,
+            "data_points": len(self)
+        }
+
+
+class PriceStore(JsonFileStore):
+    """Price history kept in prices.json, served from a PriceHistory index"""
+
+    def __init__(self, filepath):
+        super().__init__(filepath, {"prices": [], "last_updated": None})
+        self._history = None
+        self._history_source = None
+
+    def history(self):
+        """PriceHistory for the current file contents, rebuilt only after a reload"""
+        with self.lock:
+            prices_data = self.load()
+            if self._history_source is not prices_data:
+                self._history = PriceHistory(prices_data["prices"])
+                self._history_source = prices_data
+            return self._history
+
+    def latest(self):
+        """Most recent price entry, or None"""
+        return self.history().latest()
+
+    def between(self, start=None, end=None):
+        """Price entries between two epoch timestamps, oldest first"""
+        return self.history().between(start, end)
+
+    def iter_between(self, start=None, end=None):
+        """Iterate price entries between two epoch timestamps, oldest first"""
+        return iter(self.between(start, end))
+
+    def buckets(self, resolution, start=None, end=None):
+        """OHLC buckets ('hour', 'day' or 'week') between two epoch timestamps"""
+        return self.history().buckets.between(resolution, start, end)
+
+    def count(self):
+        return len(self.history())
+
+    def stats(self):
+        """Rolling aggregates kept up to date by append (rebuilt from the entries on load)"""
+        return self.history().summary()
+
+    def append(self, entry, keep_days=30):
+        """Add a price entry and drop entries older than keep_days.
+
+        Ids keep increasing and are never renumbered. Entries appended by
+        other processes are picked up first, under the shared write lock.
+        """
+        with self.write_lock, self.lock:
+            history = self.history()
+            # Highest id, not the newest entry's: another process may have
+            # stored a later timestamp first
+            entry = {"id": history.last_id + 1, **entry}
+            history.append(entry)
+            history.expire((datetime.now() - timedelta(days=keep_days)).timestamp())
+
+            prices_data = {
+                "prices": history.entries(),
+                "last_updated": datetime.now().isoformat()
+            }
+            self.save(prices_data)
+            self._history_source = prices_data
+            return entry
+
+
+def _canonical_district(record):
+    # districts imports this module
+    from districts import normalize_district
+    return normalize_district(record.get("district"))
+
+
+class SubmissionLog:
+    """Submissions stored as a JSON snapshot plus an append-only JSON Lines journal.
+
+    Each new or changed submission is one line appended to the journal; the
+    snapshot is only rewritten by ``compact``, which folds the journal into it.
+    Journal lines are full records and are replayed over the snapshot by id,
+    so replaying a line twice is harmless.
+
+    Several processes can share the files: writers take ``write_lock``,
+    catch up on the journal and only then assign ids and append, and only
+    one process compacts at a time.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_threshold=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.rotated_path = journal_path + '.compacting'
+        # Next free id, so ids handed out before their record is written stay unique
+        self.ids_path = journal_path + '.ids'
+        self.compact_threshold = compact_threshold
+        self.lock = threading.RLock()
+        self.write_lock = FileLock(journal_path + '.lock')
+        self._compact_lock = FileLock(journal_path + '.compact.lock')
+        self._records = None
+        self._positions = {}
+        self._status_counts = {}
+        self._next_id = 1
+        # Sorted (timestamp, id) keys for page(), overall (key None) and per
+        # canonical district; rebuilt lazily when None
+        self._orders = None
+        self._compaction = None
+        self._journal_stamp = None
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._listeners = []
+        self._reloading = False
+        self._compactor = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _apply(self, record):
+        """Insert or replace a record by id"""
+        record_id = record.get("id")
+        position = self._positions.get(record_id)
+        status = record.get("status")
+        self._status_counts[status] = self._status_counts.get(status, 0) + 1
+        old = None
+        if record_id is not None and position is not None:
+            old = self._records[position]
+            self._status_counts[old.get("status")] -= 1
+            self._records[position] = record
+            if old.get("timestamp") != record.get("timestamp") or old.get("district") != record.get("district"):
+                self._orders = None
+        else:
+            if record_id is not None:
+                self._positions[record_id] = len(self._records)
+                self._next_id = max(self._next_id, record_id + 1)
+                if self._orders is not None:
+                    key = (record.get("timestamp") or '', record_id)
+                    everything = self._orders[None]
+                    # New submissions are nearly always the latest, and then
+                    # also the latest of their district
+                    if not everything or key > everything[-1]:
+                        everything.append(key)
+                        district = _canonical_district(record)
+                        if district:
+                            self._orders.setdefault(district, []).append(key)
+                    else:
+                        self._orders = None
+            self._records.append(record)
+        if not self._reloading:
+            for listener in self._listeners:
+                listener.change(old, record)
+
+    def _replay(self, path, offset=0):
+        """Apply complete journal lines from offset, return (new offset, lines read)"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return offset, 0
+        STORAGE_BYTES.inc(len(chunk), operation='replay', file=os.path.basename(path))
+        # A trailing line without a newline is still being written
+        end = chunk.rfind(b'\n') + 1
+        count = 0
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                continue
+            count += 1
+        return offset + end, count
+
+    def _compaction_stamp(self):
+        """Stamps of the snapshot and the rotated journal; each compaction step changes one"""
+        return (self._stamp(self.snapshot_path), self._stamp(self.rotated_path))
+
+    def _reload(self):
+        while True:
+            self._records = []
+            self._positions = {}
+            self._status_counts = {}
+            self._next_id = 1
+            self._orders = None
+            self._reloading = True
+            try:
+                stamp = self._compaction_stamp()
+                for record in load_json_file(self.snapshot_path, []):
+                    self._apply(record)
+                self._replay(self.rotated_path)
+                self._journal_stamp = self._stamp(self.journal_path)
+                self._journal_offset, self._journal_lines = self._replay(self.journal_path)
+            finally:
+                self._reloading = False
+            # Another process compacted while we read: start over
+            if self._compaction_stamp() == stamp:
+                break
+        self._compaction = stamp
+        for listener in self._listeners:
+            listener.reset(self._records)
+
+    def _refresh(self):
+        """Pick up changes made to the files by someone else"""
+        if self._records is None or self._compaction_stamp() != self._compaction:
+            self._reload()
+            return
+        journal_stamp = self._stamp(self.journal_path)
+        if journal_stamp == self._journal_stamp:
+            return
+        if journal_stamp is None or (self._journal_stamp is not None
+                                     and (journal_stamp[0] != self._journal_stamp[0]
+                                          or journal_stamp[2] < self._journal_offset)):
+            # Journal was replaced or truncated behind our back
+            self._reload()
+            return
+        self._journal_offset, count = self._replay(self.journal_path, self._journal_offset)
+        self._journal_lines += count
+        self._journal_stamp = journal_stamp
+
+    def _append(self, records, sync=False):
+        """Write records to the journal in a single append, fsynced if ``sync``"""
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+        with STORAGE_LATENCY.time(operation='append', file=os.path.basename(self.journal_path)):
+            with open(self.journal_path, 'a') as f:
+                f.write(lines)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+                self._journal_offset = f.tell()
+        STORAGE_BYTES.inc(len(lines.encode()), operation='append', file=os.path.basename(self.journal_path))
+        self._journal_stamp = self._stamp(self.journal_path)
+        self._journal_lines += len(records)
+
+    def subscribe(self, listener):
+        """Keep a view in step with the submissions.
+
+        ``listener.reset(records)`` is called now and after every full
+        reload, ``listener.change(old, new)`` for each added (old is None)
+        or changed record, including ones picked up from other processes.
+        """
+        with self.lock:
+            self._listeners.append(listener)
+            if self._records is not None:
+                listener.reset(self._records)
+            self._refresh()
+
+    def sync(self):
+        """Apply changes other processes have written since the last call"""
+        with self.lock:
+            self._refresh()
+
+    def get(self, submission_id):
+        with self.lock:
+            self._refresh()
+            position = self._positions.get(submission_id)
+            return self._records[position] if position is not None else None
+
+    def version(self):
+        """Token that changes whenever a submission is added, changed or compacted"""
+        return (self._stamp(self.snapshot_path), self._stamp(self.journal_path))
+
+    def load(self):
+        """Return the list of submissions (shared, treat as read-only)"""
+        with self.lock:
+            self._refresh()
+            return self._records
+
+    def iter(self, status=None, start=None, end=None):
+        """Iterate submissions in the order they were written, filtered by status and ISO timestamp range.
+
+        That is id order for one process; workers take ids in blocks
+        (see group_commit), so ids from different workers can interleave.
+        """
+        submissions = self.load()
+        # Records appended while iterating are left for the next export
+        for i in range(len(submissions)):
+            submission = submissions[i]
+            if status and submission.get('status') != status:
+                continue
+            timestamp = submission.get('timestamp') or ''
+            if (start and timestamp < start) or (end and timestamp > end):
+                continue
+            yield submission
+
+    def page(self, status=None, district=None, after=None, limit=100, descending=False):
+        """Up to ``limit`` submissions in (timestamp, id) order, starting after the key ``after``.
+
+        Filters are applied before the limit, so a page is always full
+        unless the end has been reached. ``district`` is a canonical
+        district name and matches its aliases too; only that district's
+        submissions are walked.
+        """
+        with self.lock:
+            self._refresh()
+            if self._orders is None:
+                everything = sorted((s.get("timestamp") or '', s["id"]) for s in self._records
+                                    if s.get("id") is not None)
+                self._orders = {None: everything}
+                for key in everything:
+                    canonical = _canonical_district(self._records[self._positions[key[1]]])
+                    if canonical:
+                        self._orders.setdefault(canonical, []).append(key)
+            order = self._orders.get(district, [])
+            if descending:
+                start = bisect.bisect_left(order, after) if after else len(order)
+                keys = (order[i] for i in range(start - 1, -1, -1))
+            else:
+                start = bisect.bisect_right(order, after) if after else 0
+                keys = (order[i] for i in range(start, len(order)))
+            results = []
+            for _, record_id in keys:
+                if len(results) >= limit:
+                    break
+                record = self._records[self._positions[record_id]]
+                if status and record.get("status") != status:
+                    continue
+                results.append(record)
+            return results
+
+    def count(self, status=None):
+        if status:
+            return self.status_counts().get(status, 0)
+        return len(self.load())
+
+    def status_counts(self):
+        """Number of submissions per status, maintained as records are applied"""
+        with self.lock:
+            self._refresh()
+            return {status: n for status, n in self._status_counts.items() if n and status is not None}
+
+    def add(self, submission):
+        """Assign the next id to a submission and append it to the journal"""
+        return self.add_many([submission])[0]
+
+    def _take_ids(self, count):
+        """First of ``count`` new ids (write_lock held)"""
+        fd = os.open(self.ids_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                reserved = int(os.read(fd, 32) or 0)
+            except ValueError:
+                reserved = 0
+            first = max(self._next_id, reserved)
+            if count:
+                # The counter only grows, so the new value covers the old one
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, str(first + count).encode())
+        finally:
+            os.close(fd)
+        return first
+
+    def reserve_ids(self, count=1):
+        """Hand out ``count`` consecutive ids for records passed to add_many later"""
+        with self.write_lock, self.lock:
+            self._refresh()
+            return self._take_ids(count)
+
+    def add_many(self, submissions, sync=False):
+        """Assign ids to several submissions and append them in one write.
+
+        Submissions that already carry an id from ``reserve_ids`` keep it.
+        """
+        with self.write_lock, self.lock:
+            self._refresh()
+            first = self._take_ids(sum(1 for s in submissions if "id" not in s))
+            records = []
+            for submission in submissions:
+                if "id" not in submission:
+                    submission = {"id": first, **submission}
+                    first += 1
+                records.append(submission)
+            self._append(records, sync)
+            for record in records:
+                self._apply(record)
+            return records
+
+    def update(self, record):
+        """Append a changed version of an existing submission"""
+        with self.write_lock, self.lock:
+            self._refresh()
+            self._append([record])
+            self._apply(record)
+            return record
+
+    def compact(self):
+        """Fold the journal into the snapshot file"""
+        with self._compact_lock:
+            with self.write_lock, self.lock:
+                self._refresh()
+                if not self._journal_lines:
+                    return False
+                # New appends go to a fresh journal while the snapshot is written.
+                # A rotated journal left by a crashed compaction is already in
+                # _records; it is folded in now instead of being overwritten.
+                if not os.path.exists(self.rotated_path):
+                    os.replace(self.journal_path, self.rotated_path)
+                    self._journal_stamp = None
+                    self._journal_offset = 0
+                    self._journal_lines = 0
+                    self._compaction = self._compaction_stamp()
+                records = list(self._records)
+            # save_json_file swaps the snapshot in atomically for readers
+            save_json_file(self.snapshot_path, records)
+            with self.write_lock, self.lock:
+                os.remove(self.rotated_path)
+                self._compaction = self._compaction_stamp()
+            return True
+
+    def start_compactor(self, interval=60):
+        """Compact in a background thread once the journal passes the threshold"""
+        if self._compactor is not None:
+            return
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self._journal_lines >= self.compact_threshold:
+                        self.compact()
+                except Exception as e:
+                    print(f"❌ Error compacting submissions: {e}")
+        self._compactor = threading.Thread(target=run, name='submission-compactor', daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        self._stop.set()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master imports the app and loads the data once (``preload``), then
+freezes the loaded objects out of the garbage collector so forked
+workers share them copy-on-write instead of each reading the files and
+touching every page. Background threads are started per worker
+(``start_worker``). The scraper, with requests and bs4, is only
+imported by a process that runs a refresh.
+
+Run directly to print import, preload and fork-to-first-response times:
+
+    python wsgi.py
+"""
+import gc
+import json
+import os
+import sys
+import time
+
+_start = time.perf_counter()
+os.environ.setdefault('COCONUT_PRELOAD', '1')
+import app as coconut
+
+app = coconut.app
+IMPORT_SECONDS = time.perf_counter() - _start
+
+
+def preload():
+    """Read everything the read endpoints serve into memory; returns the seconds taken"""
+    start = time.perf_counter()
+    coconut.prices_store.latest()
+    coconut.prices_store.stats()
+    coconut.submissions_store.status_counts()
+    coconut.data_version.current()
+    # Objects that survive to here are never freed, so the collector
+    # needn't visit (and copy) their pages in every worker
+    gc.collect()
+    gc.freeze()
+    return time.perf_counter() - start
+
+
+def start_worker():
+    """Per-worker setup after the fork"""
+    coconut.start_background_tasks()
+
+
+def stop_worker():
+    """End open event streams so a stopping worker needn't wait for their clients"""
+    coconut.broadcaster.close()
+
+
+PRELOAD_SECONDS = preload()
+
+
+def startup_report():
+    """Import, preload and fork-to-first-response times in ms (POSIX only for the fork)"""
+    report = {
+        "import_ms": round(IMPORT_SECONDS * 1000, 1),
+        "preload_ms": round(PRELOAD_SECONDS * 1000, 1),
+        "scraper_imported": 'scraper' in sys.modules
+    }
+    if hasattr(os, 'fork'):
+        read, write = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            start_worker()
+            status = app.test_client().get('/api/stats').status_code
+            os.write(write, json.dumps({"status": status}).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            child = json.loads(f.read())
+        report["fork_to_first_response_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        report["first_response_status"] = child["status"]
+        os.waitpid(pid, 0)
+    return report
+
+
+if __name__ == '__main__':
+    print(json.dumps(startup_report(), indent=2))
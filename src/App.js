@@ -111,6 +111,38 @@ const CoconutRateApp = () => {
     fetchStats();
   }, []);
 
+  // Live price and stats changes pushed by the backend
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return undefined;
+    const events = new EventSource(`${API_BASE_URL}/events`);
+    events.addEventListener('price', (event) => {
+      const delta = JSON.parse(event.data);
+      if (delta.current_price !== undefined) setCurrentPrice(delta.current_price);
+      if (delta.last_updated !== undefined) {
+        setLastUpdated(new Date(delta.last_updated));
+        fetchPriceHistory();
+      }
+    });
+    events.addEventListener('stats', (event) => {
+      const delta = JSON.parse(event.data);
+      setStats((previous) => ({ ...(previous || {}), ...delta }));
+    });
+    // Refused (the server has too many streams open) or gone for good: poll instead
+    let poll = null;
+    events.onerror = () => {
+      if (events.readyState === EventSource.CLOSED && !poll) {
+        poll = setInterval(() => {
+          fetchCurrentPrice();
+          fetchStats();
+        }, 60000);
+      }
+    };
+    return () => {
+      events.close();
+      if (poll) clearInterval(poll);
+    };
+  }, []);
+
   // Refresh price manually
   const handleRefreshPrice = async () => {
     try {